@@ -1,89 +1,90 @@
+import os
 import sys
-import rdflib
-from rdflib import Graph, RDF, OWL, RDFS
+import time
+import threading
 import requests
-import tempfile
-from urllib.parse import urlparse, urljoin
-from bs4 import BeautifulSoup
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+import graph_cache
+import ontology_loader
+import instrumentation
+import foops_client
 
-def count_elements(graph):
-    object_properties_count = len(list(graph.subjects(rdflib.RDF.type, rdflib.OWL.ObjectProperty)))
-    classes_count = len(list(graph.subjects(rdflib.RDF.type, rdflib.OWL.Class)))
-    return object_properties_count, classes_count
+# Media types probed for content negotiation, each reported as the extension of its format
+NEGOTIATION_FORMATS = {
+    "text/turtle": ".ttl",
+    "application/rdf+xml": ".rdf",
+    "application/ld+json": ".jsonld",
+    "application/n-triples": ".nt",
+    "text/n3": ".n3",
+    "application/owl+xml": ".owl",
+}
+# Other Content-Type values accepted as an answer for a probed media type
+MEDIA_TYPE_ALIASES = {
+    "text/n3": {"text/rdf+n3"},
+}
+NEGOTIATION_TIMEOUT = float(os.environ.get("ONTOREUSE_NEGOTIATION_TIMEOUT", 10))
+NEGOTIATION_CACHE_TTL = float(os.environ.get("ONTOREUSE_NEGOTIATION_CACHE_TTL", 3600))
 
-def download_and_parse_ontology(url):
-    try:
-        response = requests.get(url, headers={"Accept": "text/turtle,application/rdf+xml,application/owl+xml,application/ld+json"}, allow_redirects=True)
-        response.raise_for_status()
-        content_type = response.headers.get('Content-Type')
-        
-        if 'text/turtle' in content_type:
-            format = 'turtle'
-        elif 'application/rdf+xml' in content_type:
-            format = 'xml'
-        elif 'application/owl+xml' in content_type:
-            format = 'xml'
-        elif 'application/ld+json' in content_type:
-            format = 'json-ld'
-        else:
-            print(f"Unexpected content type: {content_type}")
-            return None
-        
-        graph = rdflib.Graph()
-        graph.parse(data=response.content, format=format)
-        return graph
-    except requests.exceptions.RequestException as e:
-        print(f"Failed to download ontology from {url}: {e}")
-        return None
-
-def resolve_imports(graph, base_url, temp_dir):
-    for _, _, imported_iri in graph.triples((None, rdflib.OWL.imports, None)):
-        if not imported_iri.startswith('http://') and not imported_iri.startswith('https://'):
-            imported_iri = base_url + imported_iri if base_url else imported_iri
-        print(f"Resolved IRI: {imported_iri}")
-        imported_graph = download_and_parse_ontology(imported_iri)
-        if imported_graph:
-            graph += imported_graph  # Merge the graphs
-            resolve_imports(imported_graph, base_url, temp_dir)  # Recursively resolve imports
-        else:
-            print(f"Failed to download or load ontology from URL: {imported_iri}")
+# {host: {(url, media_type): (checked_at, result)}}
+_negotiation_cache = {}
+_negotiation_lock = threading.Lock()
 
-def evaluate_with_foops(ontology_url):
-    url = "http://localhost:8083/assessOntology"
-    headers = {
-        'accept': 'application/json;charset=UTF-8',
-        'Content-Type': 'application/json;charset=UTF-8'
-    }
-    data = {"ontologyUri": ontology_url}
+@instrumentation.timed("foops")
+def evaluate_with_foops(ontology_url, content_hash=None):
+    return foops_client.assess(ontology_url, content_hash)
 
+def probe_media_type(url, media_type, timeout=None):
+    # Asks for url in one media type. HEAD is tried first; servers that refuse it or
+    # leave out Content-Type get a GET whose body is never read.
+    timeout = NEGOTIATION_TIMEOUT if timeout is None else timeout
+    session = graph_cache.http_session()
+    headers = {"Accept": ", ".join([media_type] + [f"{alias};q=0.9" for alias in sorted(MEDIA_TYPE_ALIASES.get(media_type, ()))])}
+    start_time = time.perf_counter()
     try:
-        response = requests.post(url, json=data, headers=headers)
-        response.raise_for_status()
-        return response.json()
+        response = session.head(url, headers=headers, timeout=timeout, allow_redirects=True)
+        if response.status_code in (405, 501) or not response.headers.get("Content-Type"):
+            with session.get(url, headers=headers, timeout=timeout, allow_redirects=True, stream=True) as response:
+                pass
+        content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        served = response.ok and (content_type == media_type or content_type in MEDIA_TYPE_ALIASES.get(media_type, ()))
+        return {"served": served, "status": response.status_code, "content_type": content_type, "latency": time.perf_counter() - start_time}
     except requests.exceptions.RequestException as e:
-        print(f"Failed to evaluate ontology with FOOPS!: {e}")
-        return None
+        return {"served": False, "status": None, "content_type": None, "latency": time.perf_counter() - start_time, "error": str(e)}
 
-def check_content_negotiation(base_url):
-    formats = [".ttl", ".rdf", ".owl", ".jsonld", ".n3", ".nt"]
-    found_formats = set()
-    
-    try:
-        response = requests.get(base_url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        links = soup.find_all('a', href=True)
+@instrumentation.timed("content_negotiation")
+def probe_content_negotiation(url, media_types=None, timeout=None):
+    # Probes every media type concurrently and returns {media_type: result}. Answers
+    # (not failures) are cached per host for NEGOTIATION_CACHE_TTL seconds.
+    media_types = list(media_types or NEGOTIATION_FORMATS)
+    host = urlparse(url).netloc
+    now = time.time()
+    results = {}
+    missing = []
+    with _negotiation_lock:
+        host_cache = _negotiation_cache.setdefault(host, {})
+        for media_type in media_types:
+            entry = host_cache.get((url, media_type))
+            if entry and now - entry[0] < NEGOTIATION_CACHE_TTL:
+                results[media_type] = entry[1]
+            else:
+                missing.append(media_type)
+    if missing:
+        with ThreadPoolExecutor(max_workers=len(missing)) as pool:
+            for media_type, result in zip(missing, pool.map(lambda media_type: probe_media_type(url, media_type, timeout), missing)):
+                results[media_type] = result
+        with _negotiation_lock:
+            for media_type in missing:
+                if "error" not in results[media_type]:
+                    host_cache[(url, media_type)] = (now, results[media_type])
+    return {media_type: results[media_type] for media_type in media_types}
 
-        for link in links:
-            href = link['href']
-            for fmt in formats:
-                if href.endswith(fmt):
-                    found_formats.add(fmt)
-    
-    except requests.exceptions.RequestException as e:
-        print(f"Failed to check content negotiation for {base_url}: {e}")
+def served_formats(probes):
+    return set(NEGOTIATION_FORMATS.get(media_type, media_type) for media_type, result in probes.items() if result["served"])
 
-    return found_formats
+def check_content_negotiation(url):
+    # Extensions of the formats url is served in through content negotiation
+    return served_formats(probe_content_negotiation(url))
 
 def main():
     if len(sys.argv) < 2:
@@ -93,9 +94,6 @@ def main():
     ontology_source = sys.argv[1]
 
     if ontology_source.startswith('http://') or ontology_source.startswith('https://'):
-        parsed_url = urlparse(ontology_source)
-        base_url = urljoin(ontology_source, '/'.join(parsed_url.path.split('/')[:-1]) + '/')
-        
         foops_results = evaluate_with_foops(ontology_source)
         if foops_results:
             print("\nFOOPS! Evaluation Results:")
@@ -103,45 +101,31 @@ def main():
         else:
             print("Failed to get results from FOOPS!")
         
-        found_formats = check_content_negotiation(base_url)
+        probes = probe_content_negotiation(ontology_source)
+        found_formats = served_formats(probes)
         content_negotiation_score = len(found_formats)
-        print(f"\nContent Negotiation Score: {content_negotiation_score}/6")
-        print("Found formats:", ", ".join(found_formats))
+        print(f"\nContent Negotiation Score: {content_negotiation_score}/{len(NEGOTIATION_FORMATS)}")
+        print("Found formats:", ", ".join(sorted(found_formats)))
+        for media_type, result in probes.items():
+            print(f"{media_type}: {result['status']} {result['content_type']} in {result['latency']:.3f} seconds")
     else:
-        base_url = None
-        try:
-            with open(ontology_source, 'r') as file:
-                for line in file:
-                    if line.startswith('@base'):
-                        base_url = line.split('<')[1].split('>')[0]
-                        break
-                    if "imports:" in line:
-                        base_url = line.split(':')[1].strip()
-                        if base_url.startswith('<') and base_url.endswith('>'):
-                            base_url = base_url[1:-1]
-        except FileNotFoundError:
-            print("The file path is not correct. Please provide a valid file path.")
+        loaded = ontology_loader.load(ontology_source)
+        if not loaded:
             return
+        base_url = loaded.base_iri
 
-        main_graph = rdflib.Graph()
-        main_graph.parse(ontology_source, format='turtle')
+        main_object_properties_count, main_classes_count = ontology_loader.count_elements(loaded.snapshot() or loaded.graph)
+        print(f"\nTotal - Object Properties: {main_object_properties_count}, Classes: {main_classes_count}")
 
-        with tempfile.TemporaryDirectory() as temp_dir:
-            if base_url:
-                resolve_imports(main_graph, base_url, temp_dir)
-            
-            main_object_properties_count, main_classes_count = count_elements(main_graph)
-            print(f"\nTotal - Object Properties: {main_object_properties_count}, Classes: {main_classes_count}")
-            
-            if base_url:
-                foops_results = evaluate_with_foops(base_url)
-                if foops_results:
-                    print("\nFOOPS! Evaluation Results:")
-                    print(foops_results)
-                else:
-                    print("Failed to get results from FOOPS!")
+        if base_url:
+            foops_results = evaluate_with_foops(base_url)
+            if foops_results:
+                print("\nFOOPS! Evaluation Results:")
+                print(foops_results)
             else:
-                print("Base URL not found. Cannot perform FOOPS! evaluation.")
+                print("Failed to get results from FOOPS!")
+        else:
+            print("Base URL not found. Cannot perform FOOPS! evaluation.")
 
 if __name__ == "__main__":
     main()
@@ -1,50 +1,160 @@
-from flask import Flask, render_template, request
+from flask import Flask, render_template, request, jsonify, Response
 import lexical
 import structural
 import FAIRness
-import tempfile
-import os
+import jobs
+import ontology_loader
+import upload
+import budgets
+import instrumentation
+import rdf_formats
+import json
+from rdflib import URIRef
 
 app = Flask(__name__)
+# Requests are refused with 413 before the body is read; spooling enforces the exact limit
+app.config['MAX_CONTENT_LENGTH'] = upload.MAX_UPLOAD_BYTES + 1024 * 1024
+job_queue = jobs.JobQueue()
+
+# Per-stage timeouts in seconds; stages not listed use jobs.STAGE_TIMEOUT
+STAGE_TIMEOUTS = {
+    "lexical": 120,
+    "foops": 300,
+    "content_negotiation": 60,
+}
+
+def analyze_ontology(job, spooled, ontology_url, keyword):
+    # Runs every evaluation stage on an upload spooled by upload.spool_upload,
+    # recording progress and partial results on job. One budget covers the evaluation;
+    # what it cuts short is listed in job.results["truncated"].
+    budget = budgets.Budget(cancelled=job.cancel_event)
+    job.stage_started("load")
+    loaded = ontology_loader.load_upload(spooled, budget)
+    job.stage_finished("load", status="truncated" if loaded and loaded.truncated else "done")
+    if not loaded:
+        raise ValueError("Failed to load the ontology.")
+
+    # The remaining stages only read the loaded ontology, so they run side by side and
+    # the request takes as long as the slowest of them
+    results = jobs.run_stages(job, {
+        "lexical": lambda: lexical.calculate_metrics(keyword, loaded.terms),
+        "structural": lambda: structural.evaluate_loaded(loaded, budget=budget.stage(STAGE_TIMEOUTS.get("structural", jobs.STAGE_TIMEOUT))),
+        "foops": lambda: FAIRness.evaluate_with_foops(ontology_url, loaded.content_key),
+        "content_negotiation": lambda: FAIRness.probe_content_negotiation(ontology_url) if ontology_url else {},
+    }, timeouts=STAGE_TIMEOUTS)
+
+    # Each quality stage contributes what it has, even when the other failed or timed out
+    quality_result = dict(results.get("foops") or {})
+    if "content_negotiation" in results:
+        probes = results["content_negotiation"]
+        found_formats = sorted(FAIRness.served_formats(probes))
+        quality_result['found_formats'] = found_formats
+        quality_result['content_negotiation_score'] = len(found_formats)
+        quality_result['content_negotiation_latency'] = ", ".join(f"{media_type}: {probe['latency']:.3f} s" for media_type, probe in probes.items())
+    job.set_result("quality", quality_result)
+    if budget.truncated:
+        job.set_result("truncated", dict(budget.truncated))
+
+def spool_request_upload():
+    # The ontology comes either as the ontology_file form field or, for API clients,
+    # as the raw request body with an RDF Content-Type (read straight from the stream)
+    ontology_url = request.args.get('ontology_url') or request.form.get('ontology_url')
+    public_id = URIRef(ontology_url) if ontology_url else None
+    ontology_file = request.files.get('ontology_file')
+    if ontology_file is not None:
+        return upload.spool_file_storage(ontology_file, public_id)
+    if request.mimetype in rdf_formats.FORMAT_BY_MEDIA_TYPE:
+        return upload.spool_upload(request.stream, request.mimetype, None, public_id)
+    return None
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
-    lexical_result = {}
-    structural_result = {}
-    quality_result = {}
+    job = jobs.Job()
 
     if request.method == 'POST':
-        ontology_file = request.files.get('ontology_file')
         ontology_url = request.form.get('ontology_url')
         keyword = request.form.get('keyword')
 
+        spooled = None
         try:
-            with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-                ontology_file.save(temp_file.name)
-
-            ontology_terms, main_graph = lexical.load_ontology(temp_file.name)
-            if main_graph:
-                lexical_result = lexical.calculate_metrics(keyword, ontology_terms)
-                structural_result = structural.evaluate_ontology(main_graph, 0)
-                quality_result = FAIRness.evaluate_with_foops(ontology_url)
-
-                # Handle content negotiation (if necessary)
-                base_url = ontology_url.rsplit('/', 1)[0] + '/'
-                found_formats = FAIRness.check_content_negotiation(base_url)
-                quality_result['found_formats'] = found_formats
-                quality_result['content_negotiation_score'] = len(found_formats)
+            spooled = spool_request_upload()
+            if spooled is None:
+                raise ValueError("No ontology file was uploaded.")
+            analyze_ontology(job, spooled, ontology_url, keyword)
 
         except Exception as e:
             print(f"An error occurred: {e}")
 
         finally:
-            if os.path.exists(temp_file.name):
-                os.remove(temp_file.name)
+            if spooled:
+                upload.close_upload(spooled)
+
+    return render_template('index.html',
+                           lexical_result=job.result("lexical", {}),
+                           structural_result=job.result("structural", {}),
+                           quality_result=job.result("quality", {}))
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    try:
+        spooled = spool_request_upload()
+    except upload.UploadTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if spooled is None:
+        return jsonify({"error": "ontology_file or an RDF request body is required"}), 400
+    ontology_url = request.args.get('ontology_url') or request.form.get('ontology_url')
+    keyword = request.args.get('keyword') or request.form.get('keyword')
+    try:
+        job = job_queue.submit(analyze_ontology, spooled, ontology_url, keyword,
+                               cleanup=lambda: upload.close_upload(spooled))
+    except jobs.QueueFull as e:
+        upload.close_upload(spooled)
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "30"}
+    return jsonify({"id": job.id, "status": job.status}), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "unknown job"}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "unknown job"}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    # Server-sent events: one message with the full job state on every stage change
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "unknown job"}), 404
+
+    def stream():
+        version = -1
+        while True:
+            current = job.wait_for_change(version, timeout=15)
+            if current == version:
+                yield ": keep-alive\n\n"
+                continue
+            version = current
+            yield f"data: {json.dumps(job.to_dict())}\n\n"
+            if job.finished is not None:
+                break
+
+    return Response(stream(), mimetype='text/event-stream')
 
-    return render_template('index.html', 
-                           lexical_result=lexical_result, 
-                           structural_result=structural_result, 
-                           quality_result=quality_result)
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Aggregated stage timings and counters; ?format=prometheus for the text format
+    if request.args.get('format') == 'prometheus':
+        return Response(instrumentation.prometheus_text(), mimetype='text/plain; version=0.0.4')
+    return jsonify(instrumentation.snapshot())
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,165 @@
+import os
+import io
+import re
+import sys
+import csv
+import json
+import time
+import argparse
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import foops_client
+import budgets
+
+# Evaluates many candidate ontologies against one keyword, one ontology per worker
+# process. A row is written as soon as an ontology finishes; a ranking follows at the end.
+# Each evaluation runs under a budgets.Budget and each worker under the budgets memory
+# ceiling; a row cut short by either has status "truncated" and keeps what was computed.
+ONTOLOGY_EXTENSIONS = ('.ttl', '.owl', '.rdf', '.xml', '.nt', '.n3', '.jsonld')
+
+ROW_FIELDS = [
+    "source",
+    "status",
+    "error",
+    "time",
+    "truncated",
+    "Number of Related Terms (D)",
+    "Number of Related Terms in Ontology (S)",
+    "Total Number of Concepts in Ontology (O)",
+    "Domain Coverage (S/D)",
+    "Ontology Relevance (S/O)",
+    "Relationship Richness",
+    "Inheritance Richness",
+    "Inheritance Depth",
+    "Number of Roots (NoR)",
+    "Number of Leaves (NoL)",
+    "Average Depth of Inheritance Tree of Leaf Nodes (ADIT-LN)",
+    "Total number of relationships (properties)",
+    "Time to perform reasoning",
+    "FOOPS! overall score",
+    "content_negotiation_score",
+]
+
+def collect_sources(inputs):
+    # Directories contribute their ontology files; other files are read as lists of
+    # sources, one per line (numbered lines such as those in Test.txt are accepted)
+    sources = []
+    for item in inputs:
+        if item.startswith('http://') or item.startswith('https://'):
+            sources.append(item)
+        elif os.path.isdir(item):
+            for name in sorted(os.listdir(item)):
+                if name.lower().endswith(ONTOLOGY_EXTENSIONS):
+                    sources.append(os.path.join(item, name))
+        elif item.lower().endswith(ONTOLOGY_EXTENSIONS):
+            sources.append(item)
+        else:
+            with open(item, 'r') as file:
+                for line in file:
+                    match = re.search(r'(https?://\S+|\S+\.(?:ttl|owl|rdf|xml|nt|n3|jsonld))\s*$', line.strip())
+                    if match:
+                        sources.append(match.group(1))
+    return list(dict.fromkeys(sources))
+
+def is_url(source):
+    return source.startswith('http://') or source.startswith('https://')
+
+def evaluate_source(source, keyword, fairness=True):
+    # Runs in a worker process. The stage modules print progress to stdout, which
+    # would corrupt the streamed rows, so it is discarded here.
+    import lexical
+    import structural
+    import FAIRness
+    import ontology_loader
+    import jobs
+
+    row = {"source": source, "status": "ok", "error": None}
+    start_time = time.perf_counter()
+    budget = budgets.Budget()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            loaded = ontology_loader.load(source, budget)
+            if not loaded:
+                raise ValueError("Failed to load the ontology.")
+            row.update((key, value) for key, value in lexical.calculate_metrics(keyword, loaded.terms).items() if key != 'Related Terms')
+            row.update(structural.evaluate_loaded(loaded, budget=budget.stage(jobs.STAGE_TIMEOUT)))
+            row.pop("Truncated", None)
+            if fairness and is_url(source):
+                row["content_negotiation_score"] = len(FAIRness.check_content_negotiation(source))
+    except MemoryError:
+        # The worker reached its share of ONTOREUSE_WORKER_MEMORY_MB; the stages done so far are kept
+        budget.truncate("memory", f"worker memory limit of {budgets.WORKER_MEMORY_MB} MB reached")
+        if "Domain Coverage (S/D)" not in row:
+            row["status"] = "failed"
+            row["error"] = budget.truncated["memory"]
+    except Exception as e:
+        row["status"] = "failed"
+        row["error"] = str(e)
+    row["truncated"] = budgets.describe(budget.truncated)
+    if row["truncated"] and row["status"] == "ok":
+        row["status"] = "truncated"
+    row["time"] = time.perf_counter() - start_time
+    return row
+
+def rank(rows):
+    # Highest domain coverage first, then relevance, then FOOPS! score
+    def key(row):
+        return (row["status"] != "failed",
+                row.get("Domain Coverage (S/D)") or 0,
+                row.get("Ontology Relevance (S/O)") or 0,
+                row.get("FOOPS! overall score") or 0)
+    return sorted(rows, key=key, reverse=True)
+
+def run_batch(sources, keyword, workers=None, fairness=True, output_format='json', out=sys.stdout):
+    if output_format == 'csv':
+        writer = csv.DictWriter(out, fieldnames=ROW_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+    rows = []
+    # FOOPS! runs from this process, through the client's bounded queue, rather than
+    # from every worker at once. Its threads are running when the workers start, so the
+    # workers are spawned, not forked with locks those threads may hold.
+    foops_futures = foops_client.submit_many(source for source in sources if is_url(source)) if fairness else {}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=budgets.limit_memory) as pool:
+        futures = [pool.submit(evaluate_source, source, keyword, fairness) for source in sources]
+        for future in as_completed(futures):
+            row = future.result()
+            if row["source"] in foops_futures:
+                foops_result = foops_futures[row["source"]].result()
+                if foops_result:
+                    row["FOOPS! overall score"] = foops_result.get("overall_score")
+            rows.append(row)
+            if output_format == 'csv':
+                writer.writerow(row)
+            else:
+                out.write(json.dumps(row, default=str) + "\n")
+            out.flush()
+    return rank(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate and rank many ontologies against a keyword.")
+    parser.add_argument("keyword")
+    parser.add_argument("inputs", nargs="+", help="ontology files or URLs, directories of ontology files, or files listing sources one per line")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: number of CPUs)")
+    parser.add_argument("--format", choices=["json", "csv"], default="json", help="format of the streamed rows")
+    parser.add_argument("--no-fairness", action="store_true", help="skip the FOOPS! and content negotiation checks")
+    args = parser.parse_args()
+
+    sources = collect_sources(args.inputs)
+    if not sources:
+        print("No ontology sources found.", file=sys.stderr)
+        sys.exit(1)
+
+    ranking = run_batch(sources, args.keyword, args.workers, not args.no_fairness, args.format)
+    print(f"\nRanking for '{args.keyword}':", file=sys.stderr)
+    for position, row in enumerate(ranking, 1):
+        if row["status"] != "failed":
+            print(f"{position}. {row['source']}: Domain Coverage {row['Domain Coverage (S/D)']:.2f}%, "
+                  f"Ontology Relevance {row['Ontology Relevance (S/O)']:.2f}%"
+                  f"{' (truncated)' if row['status'] == 'truncated' else ''}", file=sys.stderr)
+        else:
+            print(f"{position}. {row['source']}: failed ({row['error']})", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
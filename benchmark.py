@@ -0,0 +1,383 @@
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import threading
+import contextlib
+import tracemalloc
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from rdflib import Graph, URIRef, Literal, RDF, RDFS, OWL
+
+import graph_cache
+import import_closure
+import lexical
+import structural
+import ontology_loader
+import FAIRness
+import foops_client
+import snapshot
+import streaming
+import reasoning
+
+# Repeatable benchmarks for every evaluation stage, run on the bundled input/*.ttl
+# ontologies and on synthetic ontologies of configurable size and shape. Network
+# stages (imports, FOOPS!, content negotiation) go to a local stub server. Results
+# are written as JSON and can be compared against a previous run to flag regressions.
+INPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "input")
+FOOPS_SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "foopsReuse", "sample.json")
+SYNTHETIC_NS = "http://example.org/synthetic#"
+# Entry points timed by the cold-start benchmark, and dependencies that only the stage
+# using them may import; neither list may grow an import-time cost unnoticed
+COLD_START_MODULES = ["app", "batch", "lexical", "structural", "FAIRness", "ontology_loader"]
+LAZY_MODULES = ["owlready2", "nltk", "numpy", "bs4", "rdflib.plugins.sparql", "rdflib.compare"]
+COLD_START_SCRIPT = """
+import sys, time
+start_time = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start_time
+print(elapsed)
+print(",".join(name for name in {lazy!r} if name in sys.modules))
+"""
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Serves registered documents for GET and HEAD and a canned FOOPS! answer for POST
+    # /assessOntology. A document is {content_type: body}; the variant named in the
+    # Accept header is served, otherwise the first one. Every answer waits `latency` seconds.
+    documents = {}
+    foops_response = b"{}"
+    latency = 0
+
+    def variant(self):
+        time.sleep(self.latency)
+        variants = self.documents.get(self.path)
+        if not variants:
+            return None
+        accepted = [media_range.split(";")[0].strip() for media_range in self.headers.get("Accept", "").split(",")]
+        for content_type in accepted:
+            if content_type in variants:
+                return content_type, variants[content_type]
+        return next(iter(variants.items()))
+
+    def do_GET(self):
+        document = self.variant()
+        if document is None:
+            self.send_error(404)
+            return
+        content_type, body = document
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        document = self.variant()
+        self.send_response(200 if document else 404)
+        if document:
+            self.send_header("Content-Type", document[0])
+        self.end_headers()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.foops_response)))
+        self.end_headers()
+        self.wfile.write(self.foops_response)
+
+    def log_message(self, format, *args):
+        pass
+
+class StubServer:
+    def __init__(self):
+        handler = type("Handler", (StubHandler,), {"documents": {}, "foops_response": b"{}"})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.handler = handler
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def add(self, path, body, content_type="text/turtle"):
+        return self.add_variants(path, {content_type: body})
+
+    def add_variants(self, path, variants):
+        self.handler.documents[path] = {content_type: body if isinstance(body, bytes) else body.encode("utf-8")
+                                        for content_type, body in variants.items()}
+        return self.base_url + path
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+def synthetic_ontology(num_classes, shape="wide", seed=0):
+    # wide: every class has up to 50 direct subclasses, so the hierarchy is shallow
+    # deep: chains of up to 500 classes hanging off earlier classes
+    # Every tenth class gets a second superclass, and there is one object property per ten classes.
+    rng = random.Random(seed)
+    graph = Graph()
+    classes = [URIRef(f"{SYNTHETIC_NS}Class{i}") for i in range(num_classes)]
+    for i, cls in enumerate(classes):
+        graph.add((cls, RDF.type, OWL.Class))
+        graph.add((cls, RDFS.label, Literal(f"Class {i}")))
+        if i == 0:
+            continue
+        if shape == "deep":
+            parent = i - 1 if i % 500 else rng.randrange(i)
+        else:
+            parent = (i - 1) // 50
+        graph.add((cls, RDFS.subClassOf, classes[parent]))
+        if i % 10 == 0:
+            graph.add((cls, RDFS.subClassOf, classes[rng.randrange(i)]))
+    for i in range(num_classes // 10):
+        prop = URIRef(f"{SYNTHETIC_NS}property{i}")
+        graph.add((prop, RDF.type, OWL.ObjectProperty))
+        graph.add((prop, RDFS.domain, classes[rng.randrange(num_classes)]))
+        graph.add((prop, RDFS.range, classes[rng.randrange(num_classes)]))
+    return graph
+
+def measure(func, track_allocations=False):
+    # Wall time, growth of the process peak RSS and (optionally) peak traced allocations
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if track_allocations:
+        tracemalloc.start()
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func()
+    elapsed = time.perf_counter() - start_time
+    measurement = {"time": elapsed}
+    if track_allocations:
+        measurement["alloc_peak_mb"] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    scale = 1024 * 1024 if platform.system() == "Darwin" else 1024
+    measurement["peak_rss_growth_mb"] = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / scale
+    return result, measurement
+
+def run_stage(results, name, func, repeat=1, track_allocations=False):
+    # Best of repeat runs; allocations are measured in one extra run so tracing does not skew times
+    try:
+        measurements = []
+        result = None
+        for _ in range(repeat):
+            result, measurement = measure(func)
+            measurements.append(measurement)
+        best = min(measurements, key=lambda measurement: measurement["time"])
+        if track_allocations:
+            best["alloc_peak_mb"] = measure(func, track_allocations=True)[1]["alloc_peak_mb"]
+        results[name] = best
+        return result
+    except Exception as e:
+        results[name] = {"error": str(e)}
+        return None
+
+def benchmark_graph(graph, data, stub, repeat, track_allocations, reason):
+    results = {}
+    stage = lambda name, func: run_stage(results, name, func, repeat, track_allocations)
+
+    stage("parse", lambda: Graph().parse(data=data, format="turtle"))
+    with tempfile.TemporaryDirectory() as cache_dir:
+        previous_dir = graph_cache.CACHE_DIR
+        graph_cache.CACHE_DIR = cache_dir
+        try:
+            graph_cache.parse_data(data, "turtle")
+            stage("parse_cached", lambda: graph_cache.parse_data(data, "turtle"))
+        finally:
+            graph_cache.CACHE_DIR = previous_dir
+
+    stage("count_elements", lambda: ontology_loader.count_elements(graph))
+    hierarchy = stage("build_class_hierarchy", lambda: structural.build_class_hierarchy(graph))
+    stage("relationship_richness", lambda: structural.relationship_richness(graph, hierarchy))
+    stage("inheritance_richness", lambda: structural.inheritance_richness(graph, hierarchy))
+    stage("inheritance_depth", lambda: structural.inheritance_depth(graph, hierarchy))
+    stage("count_subclasses", lambda: structural.count_subclasses(graph, hierarchy))
+    stage("count_roots_leaves", lambda: structural.count_roots_leaves(graph, hierarchy))
+    stage("average_depth_of_inheritance_tree", lambda: structural.average_depth_of_inheritance_tree(graph, hierarchy))
+    stage("execute_queries", lambda: structural.execute_queries(graph))
+    graph_snapshot = stage("snapshot_build", lambda: snapshot.build(graph))
+    if graph_snapshot is not None:
+        stage("snapshot_count_elements", lambda: ontology_loader.count_elements(graph_snapshot))
+        stage("snapshot_class_hierarchy", lambda: structural.build_class_hierarchy(graph_snapshot))
+
+    nt_path = os.path.join(tempfile.gettempdir(), f"ontoreuse-benchmark-{os.getpid()}.nt")
+    graph.serialize(destination=nt_path, format="nt", encoding="utf-8")
+    try:
+        stage("streaming_evaluation", lambda: streaming.evaluate_stream(nt_path, "nt"))
+    finally:
+        os.remove(nt_path)
+
+    concepts = list(set(str(s).split('/')[-1] for s in structural.get_classes(graph)))
+    rng = random.Random(1)
+    related_terms = [concept.lower()[:max(1, len(concept) - rng.randrange(3))] for concept in rng.sample(concepts, min(500, len(concepts)))]
+    related_terms += [f"unrelated term {i}" for i in range(100)]
+    def lexical_matching():
+        concept_index = lexical.build_concept_index(concepts)
+        return sum(1 for term in related_terms if lexical.matches_any_concept(term, concept_index))
+    stage("lexical_matching", lexical_matching)
+
+    if reason:
+        stage("reasoning", lambda: reasoning.reason(graph.serialize(format="nt", encoding="utf-8"), "ntriples"))
+
+    document_url = stub.add_variants("/ontology", {"text/turtle": data, "application/rdf+xml": b"", "application/n-triples": b""})
+    stage("foops", lambda: FAIRness.evaluate_with_foops(document_url))
+    stage("content_negotiation", lambda: FAIRness.check_content_negotiation(document_url))
+    return results
+
+def benchmark_imports(stub, repeat, track_allocations):
+    # A main ontology importing every bundled ontology from the stub server
+    urls = [stub.add(f"/imports/{name}", open(os.path.join(INPUT_DIR, name), 'rb').read())
+            for name in sorted(os.listdir(INPUT_DIR)) if name.endswith(".ttl")]
+    main = "@prefix owl: <http://www.w3.org/2002/07/owl#> .\n<http://example.org/main> a owl:Ontology ; " + \
+           " ; ".join(f"owl:imports <{url}>" for url in urls) + " .\n"
+    results = {}
+
+    def resolve():
+        graph = Graph().parse(data=main, format="turtle")
+        return import_closure.resolve_imports(graph, stub.base_url + "/imports/", ontology_loader.download_and_parse_ontology)
+
+    previous = graph_cache.CACHE_ENABLED
+    graph_cache.CACHE_ENABLED = False
+    try:
+        run_stage(results, "resolve_imports", resolve, repeat, track_allocations)
+    finally:
+        graph_cache.CACHE_ENABLED = previous
+    return results
+
+def benchmark_cold_start(repeat):
+    # Import time of every entry point in a fresh interpreter (best of repeat), and the
+    # lazily loaded dependencies each one pulled in anyway
+    results = {}
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for module in COLD_START_MODULES:
+        script = COLD_START_SCRIPT.format(module=module, lazy=LAZY_MODULES)
+        try:
+            times = []
+            for _ in range(repeat):
+                output = subprocess.run([sys.executable, "-c", script], cwd=directory, capture_output=True,
+                                        text=True, check=True).stdout.splitlines()
+                times.append(float(output[-2]))
+            results[module] = {"time": min(times), "eager_imports": [name for name in output[-1].split(",") if name]}
+        except (subprocess.CalledProcessError, ValueError, IndexError) as e:
+            results[module] = {"error": str(e)}
+    return results
+
+def cold_start_violations(results, budget):
+    # Entry points slower to import than budget seconds or importing a lazy dependency
+    violations = []
+    for module, measurement in results.items():
+        if "error" in measurement:
+            continue
+        if measurement["time"] > budget:
+            violations.append(f"{module} takes {measurement['time']:.3f} s to import (budget {budget:.3f} s)")
+        if measurement["eager_imports"]:
+            violations.append(f"{module} imports {', '.join(measurement['eager_imports'])} at start-up")
+    return violations
+
+def compare(results, baseline, tolerance, min_deltas=None):
+    # Stages whose time or traced allocations grew past baseline by more than
+    # tolerance, ignoring differences below min_deltas (seconds / MB)
+    min_deltas = min_deltas or {"time": 0.001, "alloc_peak_mb": 0.5}
+    regressions = []
+    for ontology, stages in results["results"].items():
+        for stage, measurement in stages.items():
+            previous = baseline.get("results", {}).get(ontology, {}).get(stage) or {}
+            for metric, min_delta in min_deltas.items():
+                if metric not in previous or metric not in measurement:
+                    continue
+                if measurement[metric] > previous[metric] * (1 + tolerance) and measurement[metric] - previous[metric] > min_delta:
+                    regressions.append((ontology, stage, metric, previous[metric], measurement[metric]))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the OntoReuse evaluation stages.")
+    parser.add_argument("--sizes", default="10000", help="comma-separated synthetic ontology sizes in classes, e.g. 10000,100000,1000000 (empty to skip)")
+    parser.add_argument("--shapes", default="wide,deep", help="synthetic hierarchy shapes")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage; the fastest is kept")
+    parser.add_argument("--allocations", action="store_true", help="also record peak traced allocations (slower)")
+    parser.add_argument("--reasoning", action="store_true", help="include Pellet reasoning (needs Java)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before a stage is flagged")
+    parser.add_argument("--import-budget", type=float, default=1.0, help="seconds any entry point may take to import")
+    parser.add_argument("--cold-start-only", action="store_true", help="only run the cold-start benchmark")
+    args = parser.parse_args()
+
+    reason = args.reasoning and shutil.which("java") is not None
+    if args.reasoning and not reason:
+        print("Java not found; skipping reasoning.")
+
+    results = {
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "time": time.time()},
+        "results": {},
+    }
+    with StubServer() as stub, tempfile.TemporaryDirectory() as foops_cache_dir:
+        if os.path.exists(FOOPS_SAMPLE):
+            stub.handler.foops_response = open(FOOPS_SAMPLE, 'rb').read()
+        foops_client.FOOPS_URL = stub.base_url + "/assessOntology"
+        foops_client.FOOPS_TTL = 0
+        foops_client.FOOPS_CACHE_DIR = foops_cache_dir
+        FAIRness.NEGOTIATION_CACHE_TTL = 0
+
+        workloads = []
+        for name in sorted(os.listdir(INPUT_DIR)):
+            if name.endswith(".ttl"):
+                workloads.append((name, lambda name=name: open(os.path.join(INPUT_DIR, name), 'rb').read()))
+        for size in [int(size) for size in args.sizes.split(",") if size]:
+            for shape in args.shapes.split(","):
+                workloads.append((f"synthetic-{shape}-{size}", lambda size=size, shape=shape: synthetic_ontology(size, shape).serialize(format="turtle", encoding="utf-8")))
+
+        if args.cold_start_only:
+            workloads = []
+        for name, load in workloads:
+            print(f"Benchmarking {name}...")
+            data = load()
+            graph = Graph().parse(data=data, format="turtle")
+            results["results"][name] = benchmark_graph(graph, data, stub, args.repeat, args.allocations, reason)
+            del graph
+        if not args.cold_start_only:
+            print("Benchmarking import resolution...")
+            results["results"]["imports"] = benchmark_imports(stub, args.repeat, args.allocations)
+    print("Benchmarking cold start...")
+    results["results"]["cold_start"] = benchmark_cold_start(args.repeat)
+
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+
+    for name, stages in results["results"].items():
+        print(f"\n{name}")
+        for stage, measurement in stages.items():
+            if "error" in measurement:
+                print(f"  {stage:<36} error: {measurement['error']}")
+            else:
+                print(f"  {stage:<36} {measurement['time']:.6f} s")
+    print(f"\nResults written to {args.output}")
+
+    violations = cold_start_violations(results["results"]["cold_start"], args.import_budget)
+    for violation in violations:
+        print(f"COLD START {violation}")
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for ontology, stage, metric, before, after in regressions:
+            print(f"REGRESSION {ontology} {stage} {metric}: {before:.6f} -> {after:.6f}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline.")
+    if violations:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import os
+import time
+import threading
+import instrumentation
+
+log = instrumentation.get_logger("budgets")
+
+# Resource budgets for one evaluation. A Budget carries the limits on triples, imports,
+# downloaded bytes, reasoner time and stage wall time, and records what was cut short.
+# A stage that reaches a limit stops, records a truncation and returns what it has;
+# the other stages are unaffected. The import depth limit is import_closure's
+# ONTOREUSE_IMPORT_DEPTH. Limits come from the environment; 0 disables one.
+# Worker processes also get a memory ceiling via limit_memory(), shared with any
+# reasoner JVM they start.
+def env_limit(name, default, cast=int):
+    value = os.environ.get(name)
+    return (cast(value) if value else default) or None
+
+MAX_TRIPLES = env_limit("ONTOREUSE_MAX_TRIPLES", 5000000)
+MAX_IMPORTS = env_limit("ONTOREUSE_MAX_IMPORTS", 100)
+MAX_DOWNLOAD_BYTES = env_limit("ONTOREUSE_MAX_DOWNLOAD_BYTES", 512 * 1024 * 1024)
+REASONER_TIMEOUT = env_limit("ONTOREUSE_REASONER_TIMEOUT", 300, float)
+WORKER_MEMORY_MB = env_limit("ONTOREUSE_WORKER_MEMORY_MB", None)
+# A stage deadline ends this far into the hard stage timeout of jobs.run_stages, so the
+# stage returns its partial results before it is abandoned
+STAGE_DEADLINE_FRACTION = 0.9
+# Share of the worker memory ceiling that goes to the Pellet JVM heap (-Xmx); the worker
+# process itself is limited to the rest. The JVM's memory outside its heap is not counted.
+JAVA_MEMORY_FRACTION = float(os.environ.get("ONTOREUSE_JAVA_MEMORY_FRACTION", 0.5))
+
+_memory_limit = None
+
+class BudgetExceeded(Exception):
+    pass
+
+class TripleLimitReached(BudgetExceeded):
+    pass
+
+class Budget:
+    def __init__(self, max_triples=MAX_TRIPLES, max_imports=MAX_IMPORTS, max_download_bytes=MAX_DOWNLOAD_BYTES,
+                 reasoner_timeout=REASONER_TIMEOUT, deadline=None, truncated=None, cancelled=None):
+        self.max_triples = max_triples
+        self.max_imports = max_imports
+        self.max_download_bytes = max_download_bytes
+        self.reasoner_timeout = reasoner_timeout
+        # time.monotonic() value after which the stage stops starting new work, or None
+        self.deadline = deadline
+        # threading.Event that ends the stage at once when set, e.g. Job.cancel_event
+        self.cancelled = cancelled
+        self.downloaded = 0
+        # Set once a load has reached max_triples; nothing further is loaded
+        self.triple_limit_reached = False
+        # {what: reason} for every part of the evaluation that was cut short
+        self.truncated = {} if truncated is None else truncated
+        self.lock = threading.Lock()
+
+    def stage(self, seconds):
+        # Budget for a stage with a hard timeout of seconds. It shares the truncation
+        # record with this budget, so the job sees every truncation in one place.
+        deadline = time.monotonic() + seconds * STAGE_DEADLINE_FRACTION
+        if self.deadline is not None:
+            deadline = min(deadline, self.deadline)
+        return Budget(self.max_triples, self.max_imports, self.max_download_bytes, self.reasoner_timeout,
+                      deadline, self.truncated, self.cancelled)
+
+    def is_cancelled(self):
+        return self.cancelled is not None and self.cancelled.is_set()
+
+    def remaining(self):
+        if self.is_cancelled():
+            return 0.0
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self):
+        # True once the stage should start no further work
+        return self.remaining() == 0.0
+
+    def reasoner_time(self):
+        # Seconds the reasoner may run: its own limit, cut to what is left of the stage
+        remaining = self.remaining()
+        if remaining is None:
+            return self.reasoner_timeout
+        if self.reasoner_timeout is None:
+            return remaining
+        return min(remaining, self.reasoner_timeout)
+
+    def charge_download(self, size):
+        # Counts size downloaded bytes; raises once the evaluation has downloaded too much
+        with self.lock:
+            self.downloaded += size
+            if self.max_download_bytes is not None and self.downloaded > self.max_download_bytes:
+                raise BudgetExceeded(f"downloads exceed the limit of {self.max_download_bytes} bytes")
+
+    def check_triples(self, triples):
+        # Raises TripleLimitReached when a store would hold more than max_triples triples
+        if self.max_triples is not None and triples > self.max_triples:
+            self.triple_limit_reached = True
+            raise TripleLimitReached(f"limit of {self.max_triples} triples reached")
+
+    def truncate(self, what, reason):
+        with self.lock:
+            previous = self.truncated.get(what)
+            self.truncated[what] = f"{previous}; {reason}" if previous and reason not in previous else reason
+        log.warning("%s truncated: %s", what, reason)
+        instrumentation.count(f"truncated.{what}")
+
+def describe(truncated, keys=None):
+    # "what: reason; ..." for the truncations in keys (default: all), or None
+    parts = [f"{what}: {reason}" for what, reason in truncated.items() if keys is None or what in keys]
+    return "; ".join(parts) or None
+
+def limit_memory(megabytes=None):
+    # Pool initializer: caps the memory of the worker process and the JVM it may start
+    # at megabytes together (default ONTOREUSE_WORKER_MEMORY_MB), so a runaway evaluation
+    # fails with a MemoryError instead of taking the host down. The worker's own address
+    # space gets what java_memory() leaves. A no-op without a limit or on platforms
+    # without the resource module.
+    global _memory_limit
+    megabytes = WORKER_MEMORY_MB if megabytes is None else megabytes
+    if not megabytes:
+        return
+    try:
+        import resource
+    except ImportError:
+        return
+    _memory_limit = megabytes
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    limit = (megabytes - java_memory()) * 1024 * 1024
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+def memory_limited():
+    return _memory_limit is not None
+
+def java_memory():
+    # -Xmx in MB for a JVM started by this worker, or None without a memory limit
+    if _memory_limit is None:
+        return None
+    return max(1, int(_memory_limit * JAVA_MEMORY_FRACTION))
+
+def lift_memory_limit():
+    # preexec_fn for child processes of a limited worker, e.g. the reasoner JVM, which
+    # reserves far more address space than it uses and is capped by -Xmx instead
+    import resource
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    resource.setrlimit(resource.RLIMIT_AS, (hard, hard))
@@ -0,0 +1,146 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import graph_cache
+import instrumentation
+
+# Client for the local FOOPS! service (foopsReuse). One pooled session with retries is
+# shared by every caller, at most FOOPS_MAX_CONCURRENCY assessments run at a time per
+# process, and results are cached on disk per ontology URI and content hash for
+# FOOPS_TTL seconds. Concurrent requests for the same ontology share one assessment.
+FOOPS_URL = os.environ.get("FOOPS_URL", "http://localhost:8083/assessOntology")
+# The assessment POST is not idempotent, so only failed connections are retried; a
+# request that reached FOOPS! is sent once. One assessment therefore takes at most
+# max_request_time(), which the defaults keep within the app's 300 s foops stage.
+FOOPS_CONNECT_TIMEOUT = float(os.environ.get("ONTOREUSE_FOOPS_CONNECT_TIMEOUT", 5))
+FOOPS_TIMEOUT = float(os.environ.get("ONTOREUSE_FOOPS_TIMEOUT", 270))
+FOOPS_RETRIES = int(os.environ.get("ONTOREUSE_FOOPS_RETRIES", 2))
+FOOPS_BACKOFF = 0.5
+FOOPS_TTL = float(os.environ.get("ONTOREUSE_FOOPS_TTL", 7 * 24 * 3600))
+FOOPS_MAX_CONCURRENCY = int(os.environ.get("ONTOREUSE_FOOPS_CONCURRENCY", 2))
+FOOPS_CACHE_DIR = os.path.join(graph_cache.CACHE_DIR, "foops")
+
+_session = None
+_session_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(FOOPS_MAX_CONCURRENCY)
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+_batch_executor = None
+
+def session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(total=FOOPS_RETRIES, connect=FOOPS_RETRIES, read=0, status=0, backoff_factor=FOOPS_BACKOFF)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=FOOPS_MAX_CONCURRENCY, max_retries=retry)
+            _session = requests.Session()
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+def max_request_time():
+    # Every connection attempt timing out, the backoff between them, then one full read
+    backoff = sum(FOOPS_BACKOFF * 2 ** attempt for attempt in range(1, FOOPS_RETRIES))
+    return (FOOPS_RETRIES + 1) * FOOPS_CONNECT_TIMEOUT + backoff + FOOPS_TIMEOUT
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def known_content_hash(ontology_uri):
+    # Content key of the last download of ontology_uri through graph_cache, if any
+    entry = graph_cache.load_url_index().get(ontology_uri)
+    return entry["key"] if entry else None
+
+def entry_path(ontology_uri, content_hash):
+    digest = hashlib.sha256(f"{ontology_uri}\0{content_hash or ''}".encode("utf-8")).hexdigest()
+    return os.path.join(FOOPS_CACHE_DIR, digest + ".json")
+
+def cached_result(ontology_uri, content_hash):
+    try:
+        with open(entry_path(ontology_uri, content_hash), 'r') as file:
+            entry = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return None
+    if entry.get("uri") != ontology_uri or time.time() - entry["fetched"] >= FOOPS_TTL:
+        return None
+    return entry["result"]
+
+def store_result(ontology_uri, content_hash, result):
+    # Stored under the content hash and under the URI alone, for callers that do not know the content
+    entry = json.dumps({"uri": ontology_uri, "fetched": time.time(), "result": result}).encode("utf-8")
+    try:
+        for key in {content_hash, None}:
+            graph_cache.atomic_write(entry_path(ontology_uri, key), entry)
+    except OSError as e:
+        print(f"Failed to write FOOPS! cache entry for {ontology_uri}: {e}")
+
+def request_assessment(ontology_uri):
+    headers = {
+        'accept': 'application/json;charset=UTF-8',
+        'Content-Type': 'application/json;charset=UTF-8'
+    }
+    with _slots, instrumentation.span("foops.request"):
+        response = session().post(FOOPS_URL, json={"ontologyUri": ontology_uri}, headers=headers,
+                                  timeout=(FOOPS_CONNECT_TIMEOUT, FOOPS_TIMEOUT))
+    response.raise_for_status()
+    return response.json()
+
+def assess(ontology_uri, content_hash=None, refresh=False):
+    # FOOPS! result for ontology_uri, or None when the assessment failed. content_hash
+    # identifies the ontology version; without it the last downloaded version is assumed.
+    content_hash = content_hash or known_content_hash(ontology_uri)
+    if not refresh:
+        result = cached_result(ontology_uri, content_hash)
+        if result is not None:
+            instrumentation.count("foops.cache_hits")
+            return result
+
+    key = (ontology_uri, content_hash)
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        owner = future is None
+        if owner:
+            future = _in_flight[key] = Future()
+    if not owner:
+        return future.result()
+
+    result = None
+    try:
+        result = request_assessment(ontology_uri)
+        store_result(ontology_uri, content_hash, result)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"Failed to evaluate ontology with FOOPS!: {e}")
+    finally:
+        with _in_flight_lock:
+            del _in_flight[key]
+        future.set_result(result)
+    return result
+
+def submit_many(ontology_uris):
+    # {uri: Future} for every distinct URI; the shared executor bounds the concurrency
+    global _batch_executor
+    with _session_lock:
+        if _batch_executor is None:
+            _batch_executor = ThreadPoolExecutor(max_workers=FOOPS_MAX_CONCURRENCY)
+    return {uri: _batch_executor.submit(assess, uri) for uri in dict.fromkeys(ontology_uris)}
+
+def assess_many(ontology_uris):
+    return {uri: future.result() for uri, future in submit_many(ontology_uris).items()}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python foops_client.py <ontology_uri> [<ontology_uri> ...]")
+        sys.exit(1)
+    for uri, result in assess_many(sys.argv[1:]).items():
+        print(f"{uri}: {result.get('overall_score') if result else 'failed'}")
@@ -0,0 +1,267 @@
+import os
+import json
+import mmap
+import pickle
+import hashlib
+import tempfile
+from array import array
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from rdflib import Graph, URIRef, BNode, Literal
+from rdflib.parser import InputSource
+import budgets
+import rdf_formats
+
+# Parsed ontologies are stored on disk keyed by the SHA-256 of their content, so a
+# repeat evaluation of the same ontology skips rdflib's Turtle/RDF-XML parser entirely.
+CACHE_DIR = os.environ.get("ONTOREUSE_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "ontoreuse", "graphs"))
+CACHE_MAX_BYTES = int(os.environ.get("ONTOREUSE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+CACHE_ENABLED = os.environ.get("ONTOREUSE_CACHE", "1") != "0"
+URL_INDEX = "urls.json"
+HTTP_POOL_SIZE = int(os.environ.get("ONTOREUSE_HTTP_POOL_SIZE", 16))
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+_session = None
+_session_lock = threading.Lock()
+_index_lock = threading.Lock()
+
+def http_session():
+    # One pooled session keeps connections alive per host across downloads and threads
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+def content_hasher(format, public_id=None):
+    # sha256 primed with the parse settings; feed it the content to get the cache key
+    digest = hashlib.sha256()
+    digest.update(f"{format}\0{public_id or ''}\0".encode("utf-8"))
+    return digest
+
+def content_key(content, format, public_id=None):
+    digest = content_hasher(format, public_id)
+    digest.update(content)
+    return digest.hexdigest()
+
+def entry_path(key):
+    return os.path.join(CACHE_DIR, key[:2], key + ".graph")
+
+def encode_graph(graph):
+    # Compact form: every distinct term once, triples as a flat array of term ids
+    term_ids = {}
+    terms = []
+    triples = array('L')
+    for triple in graph:
+        for term in triple:
+            term_id = term_ids.get(term)
+            if term_id is None:
+                term_id = term_ids[term] = len(terms)
+                if isinstance(term, Literal):
+                    terms.append((2, str(term), str(term.datatype) if term.datatype else None, term.language))
+                elif isinstance(term, BNode):
+                    terms.append((1, str(term)))
+                else:
+                    terms.append((0, str(term)))
+            triples.append(term_id)
+    namespaces = [(prefix, str(namespace)) for prefix, namespace in graph.namespaces()]
+    return {"terms": terms, "triples": triples, "namespaces": namespaces}
+
+def decode_graph(payload, graph=None):
+    # Into graph when given (e.g. a named graph of a Dataset), otherwise into a new Graph
+    terms = []
+    for encoded in payload["terms"]:
+        if encoded[0] == 0:
+            terms.append(URIRef(encoded[1]))
+        elif encoded[0] == 1:
+            terms.append(BNode(encoded[1]))
+        else:
+            terms.append(Literal(encoded[1], datatype=encoded[2], lang=encoded[3]))
+    if graph is None:
+        graph = Graph()
+        for prefix, namespace in payload["namespaces"]:
+            graph.bind(prefix, namespace, override=True, replace=True)
+    else:
+        # The store may be shared with other graphs; keep the prefixes already bound
+        for prefix, namespace in payload["namespaces"]:
+            graph.bind(prefix, namespace, override=False)
+    ids = payload["triples"]
+    graph.addN((terms[ids[i]], terms[ids[i + 1]], terms[ids[i + 2]], graph) for i in range(0, len(ids), 3))
+    return graph
+
+def read_entry(key, graph=None):
+    path = entry_path(key)
+    try:
+        with open(path, 'rb') as file:
+            payload = pickle.load(file)
+        os.utime(path)  # Mark as recently used for LRU eviction
+        return decode_graph(payload, graph)
+    except FileNotFoundError:
+        return None
+    except budgets.BudgetExceeded:
+        raise
+    except Exception as e:
+        print(f"Ignoring unreadable cache entry {path}: {e}")
+        return None
+
+def atomic_write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def write_entry(key, graph):
+    try:
+        atomic_write(entry_path(key), pickle.dumps(encode_graph(graph), protocol=pickle.HIGHEST_PROTOCOL))
+        evict()
+    except OSError as e:
+        print(f"Failed to write cache entry for {key}: {e}")
+
+def evict(max_bytes=None):
+    # Drop least recently used entries until the cache fits in max_bytes
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    total = 0
+    for root, _, files in os.walk(CACHE_DIR):
+        for name in files:
+            if name.endswith(".graph"):
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+    entries.sort()
+    while total > max_bytes and entries:
+        _, size, path = entries.pop(0)
+        os.remove(path)
+        total -= size
+
+def load_url_index():
+    try:
+        with open(os.path.join(CACHE_DIR, URL_INDEX), 'r') as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_url_index(index):
+    try:
+        atomic_write(os.path.join(CACHE_DIR, URL_INDEX), json.dumps(index).encode("utf-8"))
+    except OSError as e:
+        print(f"Failed to write cache URL index: {e}")
+
+def parse_data(content, format, url=None, response=None, public_id=None, graph=None):
+    # Parse raw ontology bytes, going through the cache when it is enabled.
+    # When url and response are given, the response validators are remembered for fetch().
+    # The parse functions fill graph when it is given, instead of a new Graph.
+    if not CACHE_ENABLED:
+        graph = Graph() if graph is None else graph
+        graph.parse(data=content, format=format, publicID=public_id)
+        return graph
+    key = content_key(content, format, public_id)
+    target = graph
+    graph = read_entry(key, target)
+    if graph is None:
+        graph = Graph() if target is None else target
+        graph.parse(data=content, format=format, publicID=public_id)
+        write_entry(key, graph)
+    if url and response is not None:
+        with _index_lock:
+            index = load_url_index()
+            index[url] = {
+                "key": key,
+                "format": format,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+            save_url_index(index)
+    return graph
+
+def parse_mapped(file, format, key=None, public_id=None, graph=None):
+    # Parse a non-empty binary file through a read-only memory map, so the content is
+    # never copied into a bytes object. key is the content key when the caller already
+    # hashed the content (e.g. while spooling an upload).
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+        if CACHE_ENABLED:
+            if key is None:
+                digest = content_hasher(format, public_id)
+                digest.update(view)
+                key = digest.hexdigest()
+            cached = read_entry(key, graph)
+            if cached is not None:
+                return cached
+        source = InputSource(public_id)
+        source.setByteStream(view)
+        graph = Graph() if graph is None else graph
+        graph.parse(source, format=format, publicID=public_id)
+    if CACHE_ENABLED:
+        write_entry(key, graph)
+    return graph
+
+def parse_file(path, format=None, graph=None):
+    # rdflib resolves relative IRIs in a file against its file:// URI, so that base is part
+    # of the key. Without format, the serialization is detected from the content and name.
+    public_id = URIRef("file://" + os.path.abspath(path))
+    with open(path, 'rb') as file:
+        if format is None:
+            format = rdf_formats.detect_format(file.read(rdf_formats.SNIFF_BYTES), filename=path)
+            file.seek(0)
+        if os.fstat(file.fileno()).st_size == 0:
+            return parse_data(b"", format, public_id=public_id, graph=graph)
+        return parse_mapped(file, format, public_id=public_id, graph=graph)
+
+def get(url, headers=None, budget=None, **kwargs):
+    # GET with redirects. With a download limit in budget (a budgets.Budget), the body is
+    # streamed and charged to it chunk by chunk, so an oversized download stops at the
+    # limit with budgets.BudgetExceeded instead of being read whole.
+    if budget is None or budget.max_download_bytes is None:
+        return http_session().get(url, headers=headers, allow_redirects=True, **kwargs)
+    response = http_session().get(url, headers=headers, allow_redirects=True, stream=True, **kwargs)
+    try:
+        chunks = []
+        for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+            budget.charge_download(len(chunk))
+            chunks.append(chunk)
+        response._content = b"".join(chunks)
+    finally:
+        response.close()
+    return response
+
+def revalidate(url, headers=None, budget=None, **kwargs):
+    # Returns (response, key). key is the cache key of our copy when the server confirms
+    # via ETag/Last-Modified that it is current; otherwise it is None and the response
+    # holds the content. Nothing is parsed, so this can run on any thread.
+    headers = dict(headers or {})
+    entry = load_url_index().get(url) if CACHE_ENABLED else None
+    if entry and os.path.exists(entry_path(entry["key"])):
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    response = get(url, headers, budget, **kwargs)
+    if entry and response.status_code == 304:
+        return response, entry["key"]
+    response.raise_for_status()
+    return response, None
+
+def fetch(url, headers=None, graph=None, budget=None, **kwargs):
+    # Returns (response, graph). graph is the cached parse (into graph, when given) when
+    # revalidate() confirms our copy; otherwise it is None and the caller parses
+    # response.content with parse_data().
+    response, key = revalidate(url, headers, budget, **kwargs)
+    if key is not None:
+        cached = read_entry(key, graph)
+        if cached is not None:
+            return response, cached
+        # The entry was evicted meanwhile; fetch again unconditionally
+        response = get(url, headers, budget, **kwargs)
+        response.raise_for_status()
+    return response, None
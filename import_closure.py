@@ -0,0 +1,121 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from rdflib import RDF, OWL
+import budgets
+import instrumentation
+
+log = instrumentation.get_logger("import_closure")
+
+# Shared owl:imports resolver used by ontology_loader.
+# Imports are fetched breadth-first: every IRI of the current frontier is downloaded
+# in parallel, each IRI is fetched at most once, and recursion stops at MAX_IMPORT_DEPTH.
+# Without a load function the imported graphs are merged into the main graph; with one,
+# the caller decides where each import is stored (e.g. a named graph of a Dataset).
+# With a budgets.Budget, imports past its import count, download or triple limits are
+# left out and recorded as truncated, and so are imports below MAX_IMPORT_DEPTH.
+MAX_IMPORT_DEPTH = int(os.environ["ONTOREUSE_IMPORT_DEPTH"]) if os.environ.get("ONTOREUSE_IMPORT_DEPTH") else None
+MAX_IMPORT_WORKERS = int(os.environ.get("ONTOREUSE_IMPORT_WORKERS", 8))
+
+def resolve_iri(iri, base_url):
+    iri = str(iri)
+    if not iri.startswith('http://') and not iri.startswith('https://'):
+        iri = base_url + iri if base_url else iri
+    return iri
+
+def ontology_iris(graph):
+    return set(str(s) for s in graph.subjects(RDF.type, OWL.Ontology))
+
+def imported_iris(graph, base_url):
+    return [resolve_iri(iri, base_url) for iri in graph.objects(None, OWL.imports)]
+
+def timed_download(download, iri):
+    with instrumentation.span("import_fetch") as fetch_span:
+        graph = download(iri)
+    return graph, fetch_span.elapsed
+
+def resolve_imports(graph, base_url, download, max_depth=None, max_workers=None, load=None, budget=None):
+    # Resolves the owl:imports closure of graph and returns per-import timings:
+    # {iri: {"depth", "time", "triples", "loaded"}}. download(iri) runs on the worker
+    # threads. Without load it returns a Graph or None, merged into graph. With load,
+    # load(iri, downloaded) runs on the calling thread, so it may write to a store shared
+    # with graph, and returns the imported Graph or None. download and load raise
+    # budgets.BudgetExceeded when an import would overrun budget; resolution then stops.
+    max_depth = MAX_IMPORT_DEPTH if max_depth is None else max_depth
+    max_workers = max_workers or MAX_IMPORT_WORKERS
+    max_imports = budget.max_imports if budget is not None else None
+    exhausted = False
+    seen = ontology_iris(graph)
+    timings = {}
+    frontier = []
+    for iri in imported_iris(graph, base_url):
+        if iri not in seen:
+            seen.add(iri)
+            frontier.append(iri)
+    depth = 1
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while frontier and (max_depth is None or depth <= max_depth):
+            if max_imports is not None and len(timings) + len(frontier) > max_imports:
+                room = max(0, max_imports - len(timings))
+                budget.truncate("imports", f"limit of {max_imports} imports reached")
+                frontier = frontier[:room]
+                if not frontier:
+                    break
+            futures = {pool.submit(timed_download, download, iri): iri for iri in frontier}
+            next_frontier = []
+            loaded = []
+            for future in as_completed(futures):
+                iri = futures[future]
+                if exhausted:
+                    continue
+                log.debug("Resolved IRI: %s", iri)
+                try:
+                    imported_graph, elapsed = future.result()
+                    if load is not None:
+                        with instrumentation.span("import_load") as load_span:
+                            imported_graph = load(iri, imported_graph)
+                        elapsed += load_span.elapsed
+                except budgets.BudgetExceeded as e:
+                    budget.truncate("imports", f"{iri} and later imports not loaded: {e}")
+                    exhausted = True
+                    for pending in futures:
+                        pending.cancel()
+                    timings[iri] = {"depth": depth, "time": 0, "triples": 0, "loaded": False}
+                    continue
+                except Exception as e:
+                    imported_graph, elapsed, error = None, 0, e
+                else:
+                    error = None
+                timings[iri] = {
+                    "depth": depth,
+                    "time": elapsed,
+                    "triples": len(imported_graph) if imported_graph else 0,
+                    "loaded": bool(imported_graph),
+                }
+                if not imported_graph:
+                    print(f"Failed to download or load ontology from URL: {iri}" + (f": {error}" if error else ""))
+                    continue
+                instrumentation.count("import_triples", len(imported_graph))
+                if load is None:
+                    loaded.append(imported_graph)
+                if budget is not None and budget.triple_limit_reached:
+                    # This import filled the store; it keeps what was parsed, and nothing more is loaded
+                    budget.truncate("imports", "later imports not loaded: triple limit reached")
+                    exhausted = True
+                    for pending in futures:
+                        pending.cancel()
+                    continue
+                seen.update(ontology_iris(imported_graph))
+                for sub_iri in imported_iris(imported_graph, base_url):
+                    if sub_iri not in seen:
+                        seen.add(sub_iri)
+                        next_frontier.append(sub_iri)
+            # Merge on this thread only, after the frontier is done, so no graph is mutated while being read
+            for imported_graph in loaded:
+                graph += imported_graph
+            frontier = [] if exhausted else next_frontier
+            depth += 1
+
+    if frontier and budget is not None:
+        budget.truncate("imports", f"{len(frontier)} imports below depth {max_depth} not loaded")
+    return timings
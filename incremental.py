@@ -0,0 +1,254 @@
+import sys
+import time
+import pickle
+import hashlib
+from collections import Counter
+from rdflib import URIRef, BNode, RDF, RDFS, OWL
+import graph_cache
+import structural
+import ontology_loader
+import instrumentation
+
+# Incremental structural evaluation across versions of one ontology. The evaluator
+# keeps the triples the structural metrics read (class and property typings and
+# rdfs:subClassOf), the class hierarchy index and running totals. A new version is
+# diffed against the kept triples and only the delta is applied: the touched classes
+# and their ancestors get new depths and path counts, the rest of the hierarchy is
+# reused. Reasoning and the SPARQL timings depend on the whole graph and are only run
+# on request. Kept triples are plain strings (blank nodes as "_:" keys), which hash
+# much faster than rdflib terms.
+CLASS_TYPES = (str(OWL.Class), str(RDFS.Class))
+PROPERTY_TYPES = (str(OWL.ObjectProperty), str(OWL.DatatypeProperty))
+METRIC_TYPES = CLASS_TYPES + PROPERTY_TYPES
+TYPE = str(RDF.type)
+SUBCLASS_OF = str(RDFS.subClassOf)
+OWL_CLASS, RDFS_CLASS = CLASS_TYPES
+OBJECT_PROPERTY, DATATYPE_PROPERTY = PROPERTY_TYPES
+
+log = instrumentation.get_logger("incremental")
+
+def blank_node_keys(graph, nodes):
+    # Blank node ids change on every parse, so the blank nodes in nodes are keyed by a
+    # digest of their outgoing triples (nested blank nodes by their own digest).
+    # Blank nodes with the same description are numbered in the order of their referrers.
+    digests = {}
+
+    def digest(node, active):
+        if node in digests:
+            return digests[node]
+        if node in active:
+            return "cycle"
+        active.add(node)
+        lines = sorted(f"{p.n3()} {digest(o, active) if isinstance(o, BNode) else o.n3()}" for p, o in graph.predicate_objects(node))
+        active.discard(node)
+        digests[node] = hashlib.sha1("\n".join(lines).encode("utf-8")).hexdigest()
+        return digests[node]
+
+    groups = {}
+    for node in nodes:
+        groups.setdefault(digest(node, set()), []).append(node)
+    keys = {}
+    for node_digest, group in groups.items():
+        if len(group) == 1:
+            keys[group[0]] = "_:" + node_digest
+            continue
+        def referrers(node):
+            return sorted(f"{digest(s, set()) if isinstance(s, BNode) else s.n3()} {p.n3()}" for s, p in graph.subject_predicates(node))
+        for number, node in enumerate(sorted(group, key=referrers)):
+            keys[node] = f"_:{node_digest}.{number}"
+    return keys
+
+def metric_triples(graph):
+    # The triples the structural metrics depend on, as strings with stable blank node keys
+    typed = [(s, rdf_type) for rdf_type in METRIC_TYPES for s in graph.subjects(RDF.type, URIRef(rdf_type))]
+    edges = list(graph.subject_objects(RDFS.subClassOf))
+    blank_nodes = set(s for s, _ in typed if type(s) is BNode)
+    blank_nodes.update(term for edge in edges for term in edge if type(term) is BNode)
+    keys = blank_node_keys(graph, blank_nodes) if blank_nodes else {}
+    triples = set((keys[s] if type(s) is BNode else str(s), TYPE, rdf_type) for s, rdf_type in typed)
+    triples.update((keys[s] if type(s) is BNode else str(s), SUBCLASS_OF, keys[o] if type(o) is BNode else str(o)) for s, o in edges)
+    return triples
+
+class IncrementalEvaluator:
+    def __init__(self):
+        self.triples = set()
+        self.types = {rdf_type: set() for rdf_type in METRIC_TYPES}
+        self.hierarchy = None
+        self.class_subclasses = 0
+        self.depth_counts = Counter()
+        self.num_paths = 0
+        self.total_depth = 0
+
+    def evaluate(self, graph, load_time=0, reason=False, queries=False):
+        # Same result dictionary as structural.evaluate_ontology. The first call builds
+        # the state from scratch; later calls apply the difference to the previous version.
+        with instrumentation.span("incremental.diff"):
+            triples = metric_triples(graph)
+            added = triples - self.triples
+            removed = self.triples - triples
+        if self.hierarchy is None:
+            self.rebuild(triples)
+        else:
+            self.apply(added, removed)
+        log.info("Applied %d added and %d removed metric triples.", len(added), len(removed))
+        instrumentation.count("incremental.delta", len(added) + len(removed))
+        reasoning_time = structural.check_consistency(graph)[1] if reason else None
+        query_times = structural.execute_queries(graph) if queries else None
+        return self.results(load_time, reasoning_time, query_times)
+
+    @instrumentation.timed("incremental.rebuild")
+    def rebuild(self, triples):
+        self.triples = set(triples)
+        self.types = {rdf_type: set() for rdf_type in METRIC_TYPES}
+        edges = []
+        for s, p, o in triples:
+            if p == SUBCLASS_OF:
+                edges.append((s, o))
+            else:
+                self.types[o].add(s)
+        classes = self.types[OWL_CLASS] | self.types[RDFS_CLASS]
+        self.hierarchy = structural.hierarchy_from_edges(classes, edges)
+        children = self.hierarchy["children"]
+        self.class_subclasses = sum(len(children.get(cls, ())) for cls in classes)
+        self.depth_counts = Counter(self.hierarchy["depth"].values())
+        self.num_paths = sum(self.hierarchy["path_counts"][root] for root in self.hierarchy["roots"])
+        self.total_depth = sum(self.hierarchy["depth_sums"][root] for root in self.hierarchy["roots"])
+
+    @instrumentation.timed("incremental.apply")
+    def apply(self, added, removed):
+        # Applies a triple delta (as returned by metric_triples) to the kept state
+        hierarchy = self.hierarchy
+        classes = hierarchy["classes"]
+        parents = hierarchy["parents"]
+        children = hierarchy["children"]
+        depth = hierarchy["depth"]
+        path_counts = hierarchy["path_counts"]
+        depth_sums = hierarchy["depth_sums"]
+
+        touched = set()
+        for s, p, o in removed | added:
+            touched.add(s)
+            if p == SUBCLASS_OF:
+                touched.add(o)
+        self.class_subclasses -= sum(len(children.get(node, ())) for node in touched if node in classes)
+
+        for s, p, o in removed:
+            self.triples.discard((s, p, o))
+            if p == SUBCLASS_OF:
+                parents[s].discard(o)
+                if not parents[s]:
+                    del parents[s]
+                children[o].discard(s)
+                if not children[o]:
+                    del children[o]
+                hierarchy["subclass_triples"] -= 1
+            else:
+                self.types[o].discard(s)
+                if s not in self.types[OWL_CLASS] and s not in self.types[RDFS_CLASS]:
+                    classes.discard(s)
+        for s, p, o in added:
+            self.triples.add((s, p, o))
+            if p == SUBCLASS_OF:
+                parents.setdefault(s, set()).add(o)
+                children.setdefault(o, set()).add(s)
+                hierarchy["subclass_triples"] += 1
+            else:
+                self.types[o].add(s)
+                if o in CLASS_TYPES:
+                    classes.add(s)
+        self.class_subclasses += sum(len(children.get(node, ())) for node in touched if node in classes)
+
+        # Values of touched nodes and of everything above them are stale. Below a touched
+        # node that is not a class, nodes that are not classes either only keep a value
+        # while a class still reaches them, so they are re-walked too.
+        stale = set(touched)
+        pending = [node for node in touched if node not in classes]
+        while pending:
+            for sub in children.get(pending.pop(), ()):
+                if sub not in classes and sub not in stale:
+                    stale.add(sub)
+                    pending.append(sub)
+        pending = list(stale)
+        while pending:
+            for parent in parents.get(pending.pop(), ()):
+                if parent not in stale:
+                    stale.add(parent)
+                    pending.append(parent)
+
+        roots = hierarchy["roots"]
+        for node in stale:
+            if node in roots:
+                self.num_paths -= path_counts[node]
+                self.total_depth -= depth_sums[node]
+            if node in depth:
+                self.depth_counts[depth.pop(node)] -= 1
+                del path_counts[node]
+                del depth_sums[node]
+        hierarchy["cycles"] = [cycle for cycle in hierarchy["cycles"] if cycle[0] not in stale and cycle[1] not in stale]
+
+        for node in touched:
+            if node in classes and node not in parents:
+                roots.add(node)
+            else:
+                roots.discard(node)
+            if node in classes and node not in children:
+                hierarchy["leaves"].add(node)
+            else:
+                hierarchy["leaves"].discard(node)
+
+        for node in structural.walk_hierarchy(hierarchy, [node for node in stale if node in classes]):
+            self.depth_counts[depth[node]] += 1
+        for node in stale:
+            if node in roots:
+                self.num_paths += path_counts[node]
+                self.total_depth += depth_sums[node]
+        instrumentation.count("incremental.rewalked", len(stale))
+
+    def results(self, load_time=0, reasoning_time=None, query_times=None):
+        hierarchy = self.hierarchy
+        num_classes = len(hierarchy["classes"])
+        num_object_properties = len(self.types[OBJECT_PROPERTY])
+        num_datatype_properties = len(self.types[DATATYPE_PROPERTY])
+        depths = [value for value, occurrences in self.depth_counts.items() if occurrences > 0]
+        return structural.format_structural_results({
+            "relationship_richness": structural.relationship_richness_from_counts(num_object_properties + num_datatype_properties, hierarchy["subclass_triples"]),
+            "inheritance_richness": (self.class_subclasses / num_classes) * 100 if num_classes else 0,
+            "inheritance_depth": max(depths) if depths else 0,
+            "total_subclasses": self.class_subclasses,
+            "avg_subclasses_per_class": self.class_subclasses / num_classes if num_classes else 0,
+            "num_object_properties": num_object_properties,
+            "num_datatype_properties": num_datatype_properties,
+            "num_roots": len(hierarchy["roots"]),
+            "num_leaves": len(hierarchy["leaves"]),
+            "average_depth": self.total_depth / self.num_paths if self.num_paths else 0.0,
+            "num_cycles": len(hierarchy["cycles"]),
+        }, load_time, reasoning_time, query_times)
+
+def load_state(path):
+    try:
+        with open(path, 'rb') as file:
+            return pickle.load(file)
+    except FileNotFoundError:
+        return IncrementalEvaluator()
+
+def save_state(evaluator, path):
+    graph_cache.atomic_write(path, pickle.dumps(evaluator, protocol=pickle.HIGHEST_PROTOCOL))
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python incremental.py <state_file> <ontology_source>")
+        sys.exit(1)
+
+    state_path, ontology_source = sys.argv[1], sys.argv[2]
+    loaded = ontology_loader.load(ontology_source)
+    if not loaded:
+        print("No ontology loaded.")
+        sys.exit(1)
+    evaluator = load_state(state_path)
+    start_time = time.perf_counter()
+    result = evaluator.evaluate(loaded.graph, loaded.load_time)
+    elapsed = time.perf_counter() - start_time
+    save_state(evaluator, state_path)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+    print(f"Evaluated in {elapsed:.4f} seconds.")
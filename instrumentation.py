@@ -0,0 +1,113 @@
+import os
+import time
+import logging
+import threading
+from functools import wraps
+
+# Timing spans and counters for the evaluation stages. Every span duration and every
+# counter value is folded into in-memory aggregates (count, total, min, max, last),
+# which app.py serves at /metrics; spans are also logged at DEBUG. Recording one span
+# costs two perf_counter() calls and a dict update, so spans wrap whole stages and
+# never inner loops. Set ONTOREUSE_METRICS=0 to stop aggregating.
+LOG_LEVEL = os.environ.get("ONTOREUSE_LOG_LEVEL", "WARNING").upper()
+ENABLED = os.environ.get("ONTOREUSE_METRICS", "1") != "0"
+
+logger = logging.getLogger("ontoreuse")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+
+_lock = threading.Lock()
+_spans = {}
+_counters = {}
+
+def get_logger(name):
+    return logger.getChild(name)
+
+def set_level(level):
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+
+def _observe(table, name, value):
+    with _lock:
+        stats = table.get(name)
+        if stats is None:
+            table[name] = [1, value, value, value, value]
+        else:
+            stats[0] += 1
+            stats[1] += value
+            if value < stats[2]:
+                stats[2] = value
+            if value > stats[3]:
+                stats[3] = value
+            stats[4] = value
+
+class Span:
+    __slots__ = ("name", "start", "elapsed")
+
+    def __init__(self, name):
+        self.name = name
+        self.elapsed = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed = time.perf_counter() - self.start
+        if ENABLED:
+            _observe(_spans, self.name, self.elapsed)
+            if exc_type is not None:
+                _observe(_counters, self.name + ".errors", 1)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s took %.6f seconds%s", self.name, self.elapsed, " (failed)" if exc_type else "")
+        return False
+
+def span(name):
+    # with span("parse") as parse_span: ...; parse_span.elapsed holds the duration afterwards
+    return Span(name)
+
+def timed(name):
+    # Decorator form of span()
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with Span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def count(name, value=1):
+    # Records one observation of a counter, e.g. count("triples", len(graph))
+    if ENABLED:
+        _observe(_counters, name, value)
+
+def _summary(stats):
+    observations, total, minimum, maximum, last = stats
+    return {"count": observations, "total": total, "min": minimum, "max": maximum, "mean": total / observations, "last": last}
+
+def snapshot():
+    with _lock:
+        return {
+            "spans": {name: _summary(stats) for name, stats in sorted(_spans.items())},
+            "counters": {name: _summary(stats) for name, stats in sorted(_counters.items())},
+        }
+
+def prometheus_text():
+    # The aggregates in the Prometheus text exposition format
+    lines = []
+    current = snapshot()
+    for kind, label, unit in (("spans", "span", "_seconds"), ("counters", "counter", "")):
+        for field in ("count", "total", "max", "last"):
+            metric = f"ontoreuse_{label}_count" if field == "count" else f"ontoreuse_{label}{unit}_{field}"
+            lines.append(f"# TYPE {metric} {'counter' if field in ('count', 'total') else 'gauge'}")
+            for name, summary in current[kind].items():
+                lines.append(f'{metric}{{{label}="{name}"}} {summary[field]}')
+    return "\n".join(lines) + "\n"
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _counters.clear()
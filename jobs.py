@@ -0,0 +1,255 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Background evaluation jobs for the web app. A job runs a pipeline function on a
+# bounded worker pool and records per-stage progress and partial results, which the
+# status endpoints read while the job is still running. At most MAX_PENDING_JOBS jobs
+# may be queued or running at once; further submissions are refused with QueueFull.
+MAX_WORKERS = int(os.environ.get("ONTOREUSE_JOB_WORKERS", 2))
+MAX_FINISHED_JOBS = int(os.environ.get("ONTOREUSE_MAX_FINISHED_JOBS", 100))
+# Room for the four stages of every concurrent job plus as many stages left running
+# after their timeout; once those fill the pool, new jobs are refused
+STAGE_WORKERS = int(os.environ.get("ONTOREUSE_STAGE_WORKERS", 16))
+STAGE_TIMEOUT = float(os.environ.get("ONTOREUSE_STAGE_TIMEOUT", 600))
+MAX_PENDING_JOBS = int(os.environ.get("ONTOREUSE_MAX_PENDING_JOBS", 16))
+
+# Shared by every request so that a stage left running after its timeout does not
+# hold up the request that started it
+_stage_executor = ThreadPoolExecutor(max_workers=STAGE_WORKERS)
+_stage_lock = threading.Lock()
+_busy_stages = 0
+
+class JobCancelled(Exception):
+    pass
+
+class QueueFull(Exception):
+    pass
+
+class Job:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.stages = OrderedDict()
+        self.results = {}
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.future = None
+        self.cleanup = None
+        self.cancel_event = threading.Event()
+        # Completed on cancel, so run_stages can wait on it together with the stages
+        self.cancelled = Future()
+        # Guards stages and results, which stage threads write while handlers read them
+        self.changed = threading.Condition(threading.RLock())
+        self.version = 0
+
+    def notify(self):
+        with self.changed:
+            self.version += 1
+            self.changed.notify_all()
+
+    def cancel(self):
+        self.cancel_event.set()
+        with self.changed:
+            if not self.cancelled.done():
+                self.cancelled.set_result(True)
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    def stage_queued(self, stage):
+        with self.changed:
+            self.stages[stage] = {"status": "queued", "started": time.time(), "time": None}
+            self.notify()
+
+    def stage_started(self, stage):
+        self.check_cancelled()
+        with self.changed:
+            self.stages[stage] = {"status": "running", "started": time.time(), "time": None}
+            self.notify()
+
+    def stage_finished(self, stage, result=None, status="done"):
+        with self.changed:
+            entry = self.stages.setdefault(stage, {"started": time.time()})
+            entry["status"] = status
+            entry["time"] = time.time() - entry["started"]
+            if result is not None:
+                self.results[stage] = result
+            self.notify()
+
+    def set_result(self, name, result):
+        with self.changed:
+            self.results[name] = result
+            self.notify()
+
+    def result(self, name, default=None):
+        with self.changed:
+            return self.results.get(name, default)
+
+    def wait_for_change(self, version, timeout=None):
+        with self.changed:
+            if self.version == version:
+                self.changed.wait(timeout)
+            return self.version
+
+    def to_dict(self):
+        with self.changed:
+            return {
+                "id": self.id,
+                "status": self.status,
+                "stages": {name: {"status": entry["status"], "time": entry["time"]} for name, entry in self.stages.items()},
+                "results": dict(self.results),
+                "error": self.error,
+            }
+
+def stage_workers_free():
+    # Stage threads not taken by a queued, running or timed-out stage
+    with _stage_lock:
+        return STAGE_WORKERS - _busy_stages
+
+def run_stages(job, stages, timeouts=None):
+    # Runs independent stages ({name: callable}) concurrently and returns {name: result}.
+    # Each stage is recorded on job as soon as it finishes, so its time and result are
+    # its own. A stage that fails or exceeds its timeout (counted from submission) is
+    # marked as such and left out of the returned results; the other stages are unaffected.
+    # Cancelling the job marks the unfinished stages cancelled and raises JobCancelled at
+    # once; stages that can stop early watch job.cancel_event (e.g. through a budget).
+    global _busy_stages
+    timeouts = timeouts or {}
+    job.check_cancelled()
+    lock = threading.Lock()
+    settled = {}
+    results = {}
+
+    def settle(name, status, result=None):
+        # Records the first outcome of a stage only; a stage finishing after its timeout is ignored
+        with lock:
+            if name in settled:
+                return False
+            settled[name] = status
+            if status == "done":
+                results[name] = result
+        job.stage_finished(name, result, status)
+        return True
+
+    def run_stage(name, func):
+        global _busy_stages
+        try:
+            if name in settled:
+                return
+            job.stage_started(name)
+            result = func()
+        except JobCancelled:
+            settle(name, "cancelled")
+        except Exception as e:
+            if settle(name, "failed"):
+                print(f"Stage {name} failed: {e}")
+        else:
+            settle(name, "done", result)
+        finally:
+            with _stage_lock:
+                _busy_stages -= 1
+
+    start_time = time.time()
+    pending = {}
+    for name, func in stages.items():
+        job.stage_queued(name)
+        with _stage_lock:
+            _busy_stages += 1
+        pending[_stage_executor.submit(run_stage, name, func)] = name
+
+    while pending:
+        deadlines = {future: start_time + timeouts.get(name, STAGE_TIMEOUT) for future, name in pending.items()}
+        done, _ = wait(list(pending) + [job.cancelled], timeout=max(0, min(deadlines.values()) - time.time()),
+                       return_when=FIRST_COMPLETED)
+        if job.cancel_event.is_set():
+            for future, name in pending.items():
+                if future.cancel():
+                    with _stage_lock:
+                        _busy_stages -= 1
+                settle(name, "cancelled")
+            raise JobCancelled()
+        for future in done:
+            del pending[future]
+        for future in [future for future in pending if deadlines[future] <= time.time()]:
+            name = pending.pop(future)
+            if future.cancel():
+                with _stage_lock:
+                    _busy_stages -= 1
+            if settle(name, "timeout"):
+                print(f"Stage {name} timed out")
+    job.check_cancelled()
+    with lock:
+        return dict(results)
+
+class JobQueue:
+    def __init__(self, max_workers=None, max_pending=None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or MAX_WORKERS)
+        self.max_pending = MAX_PENDING_JOBS if max_pending is None else max_pending
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, pipeline, *args, cleanup=None, **kwargs):
+        # pipeline(job, *args, **kwargs) reports progress through job.stage_started/stage_finished.
+        # Raises QueueFull when max_pending jobs are already queued or running (0: no limit),
+        # or when stages left running after their timeout hold every stage thread.
+        job = Job()
+        job.cleanup = cleanup
+        with self.lock:
+            pending = sum(1 for queued in self.jobs.values() if queued.finished is None)
+            if self.max_pending and pending >= self.max_pending:
+                raise QueueFull(f"{pending} jobs are already queued or running")
+            if stage_workers_free() <= 0:
+                raise QueueFull("every stage worker is busy")
+            self.jobs[job.id] = job
+            self.prune()
+        job.future = self.executor.submit(self.run, job, pipeline, args, kwargs)
+        return job
+
+    def run(self, job, pipeline, args, kwargs):
+        try:
+            job.check_cancelled()
+            job.status = "running"
+            job.notify()
+            pipeline(job, *args, **kwargs)
+            job.status = "done"
+        except JobCancelled:
+            job.status = "cancelled"
+        except Exception as e:
+            print(f"Job {job.id} failed: {e}")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            self.finish(job)
+
+    def finish(self, job):
+        if job.cleanup:
+            job.cleanup()
+            job.cleanup = None
+        job.finished = time.time()
+        job.notify()
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        # Queued jobs never start; running jobs stop waiting for their stages at once
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel()
+        if job.future is not None and job.future.cancel():
+            job.status = "cancelled"
+            self.finish(job)
+        return job
+
+    def prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished is not None]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
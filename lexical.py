@@ -1,121 +1,22 @@
 #For Photovoltaic
 
+import os
 import sys
-import rdflib
-from rdflib import Graph, RDF, OWL, RDFS
-import requests
 from difflib import SequenceMatcher
-import tempfile
-import nltk
-from nltk.corpus import wordnet as wn
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+import ontology_loader
+import term_expansion
+import instrumentation
 
-# Ensure NLTK WordNet is available
-nltk.download('wordnet')
-
-# Function to count elements in the ontology graph
-def count_elements(graph):
-    classes = set(graph.subjects(RDF.type, OWL.Class))
-    object_properties = set(graph.subjects(RDF.type, OWL.ObjectProperty))
-    
-    for s, p, o in graph.triples((None, RDF.type, OWL.Restriction)):
-        for sub, prop, obj in graph.triples((s, OWL.onProperty, None)):
-            if (obj, RDF.type, OWL.ObjectProperty) in graph:
-                object_properties.add(obj)
-            elif (obj, RDF.type, OWL.Class) in graph:
-                classes.add(obj)
-
-    return len(object_properties), len(classes)
-
-# Function to download and parse an ontology
-def download_and_parse_ontology(url):
-    try:
-        response = requests.get(url, headers={"Accept": "text/turtle,application/rdf+xml"}, allow_redirects=True)
-        response.raise_for_status()
-        
-        graph = Graph()
-        try:
-            graph.parse(data=response.content, format='turtle')
-        except Exception as e:
-            graph.parse(data=response.content, format='xml')  # Fallback to RDF/XML if Turtle fails
-        return graph
-    except requests.exceptions.RequestException as e:
-        print(f"Failed to download ontology from {url}: {e}")
-        return None
-    except Exception as e:
-        print(f"Failed to parse ontology from {url}: {e}")
-        return None
-
-# Function to resolve imports in the ontology
-def resolve_imports(graph, base_url, temp_dir):
-    for _, _, imported_iri in graph.triples((None, OWL.imports, None)):
-        imported_iri = str(imported_iri)
-        if not imported_iri.startswith('http://') and not imported_iri.startswith('https://'):
-            imported_iri = base_url + imported_iri if base_url else imported_iri
-        print(f"Resolved IRI: {imported_iri}")
-        imported_graph = download_and_parse_ontology(imported_iri)
-        if imported_graph:
-            graph += imported_graph
-            resolve_imports(imported_graph, base_url, temp_dir)
-        else:
-            print(f"Failed to download or load ontology from URL: {imported_iri}")
-
-# Function to load the ontology from a source
-def load_ontology(source):
-    if source.startswith('http://') or source.startswith('https://'):
-        main_graph = download_and_parse_ontology(source)
-        base_url = source.rsplit('/', 1)[0] + '/' if main_graph else None
-    else:
-        base_url = None
-        try:
-            if source:
-                with open(source, 'r') as file:
-                    for line in file:
-                        if line.startswith('@base'):
-                            base_url = line.split('<')[1].split('>')[0]
-                            break
-                        if "imports:" in line:
-                            base_url = line.split(':')[1].strip()
-                            if base_url.startswith('<') and base_url.endswith('>'):
-                                base_url = base_url[1:-1]
-
-                main_graph = Graph()
-                main_graph.parse(source, format='turtle')
-            else:
-                main_graph = None
-        except FileNotFoundError:
-            print("The file path is not correct. Please provide a valid file path.")
-            main_graph = None
-
-    if main_graph:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            if base_url:
-                resolve_imports(main_graph, base_url, temp_dir)
-            object_properties_count, classes_count = count_elements(main_graph)
-            print(f"\nTotal - Object Properties: {object_properties_count}, Classes: {classes_count}")
-            ontology = set()
-            for s in main_graph.subjects(RDF.type, OWL.Class):
-                ontology.add(str(s).split('/')[-1])
-            for s in main_graph.subjects(RDF.type, RDFS.Class):
-                ontology.add(str(s).split('/')[-1])
-
-            return list(ontology), main_graph
-    else:
-        print("Failed to load the ontology.")
-        return [], None
+# Keywords expanded at once by calculate_metrics_many, and the size (terms x concepts)
+# of the blocks match_terms compares in one step
+EXPANSION_WORKERS = int(os.environ.get("ONTOREUSE_EXPANSION_WORKERS", 8))
+MATCH_BLOCK_CELLS = 4 * 1024 * 1024
 
 # Function to get WordNet synonyms and related terms
-def get_wordnet_synonyms(term, pos=wn.NOUN):
-    synonyms = set()
-    for synset in wn.synsets(term, pos=pos):
-        for lemma in synset.lemmas():
-            synonyms.add(lemma.name().replace('_', ' '))
-        for hypernym in synset.hypernyms():
-            for lemma in hypernym.lemmas():
-                synonyms.add(lemma.name().replace('_', ' '))
-        for hyponym in synset.hyponyms():
-            for lemma in hyponym.lemmas():
-                synonyms.add(lemma.name().replace('_', ' '))
-    return list(synonyms)
+def get_wordnet_synonyms(term, pos='n'):
+    return term_expansion.wordnet_terms(term, pos)
 
 # Function to get related words using WordNet and Datamuse
 def get_related_words(input_term):
@@ -173,18 +74,7 @@ def get_related_words(input_term):
         return list(related_terms)
 
     # Add words from the Datamuse API with specific tags for relevance
-    tags = ['ml', 'rel_syn', 'rel_jja', 'rel_trg']
-    for tag in tags:
-        url = f"https://api.datamuse.com/words?{tag}={input_term_normalized}"
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            word_entries = response.json()
-            for entry in word_entries:
-                if 'word' in entry:
-                    related_terms.add(entry['word'])
-        except requests.exceptions.RequestException as e:
-            print(f"Failed to fetch related words from Datamuse API: {e}")
+    related_terms.update(term_expansion.datamuse_words(input_term_normalized, term_expansion.DATAMUSE_TAGS))
 
     # Filter terms based on string similarity
     related_terms = filter_related_terms(related_terms, input_term_normalized, threshold=0.5)
@@ -193,20 +83,128 @@ def get_related_words(input_term):
 
 # Function to filter related terms based on similarity
 def filter_related_terms(related_terms, input_term, threshold=0.5):
-    filtered_terms = [term for term in related_terms if string_similarity(input_term, term) >= threshold]
+    filtered_terms = [term for term in related_terms if similarity_at_least(input_term, term, threshold)]
     return filtered_terms
 
+# Function to test string_similarity(a, b) >= threshold, trying difflib's cheap upper bounds first
+def similarity_at_least(a, b, threshold):
+    matcher = SequenceMatcher(None, a, b)
+    return matcher.real_quick_ratio() >= threshold and matcher.quick_ratio() >= threshold and matcher.ratio() >= threshold
+
 # Function to calculate string similarity
 def string_similarity(a, b):
     return SequenceMatcher(None, a, b).ratio()
 
-# Function to calculate metrics based on the related words and ontology
-def calculate_metrics(input_term, ontology):
-    related_terms = get_related_words(input_term)
-    D = len(related_terms)
-    S = sum(1 for term in related_terms if any(string_similarity(term, concept) > 0.8 for concept in ontology))
-    O = len(ontology)
+# Function to index ontology concepts by length for fuzzy matching.
+# Each concept keeps a SequenceMatcher with the concept as its second sequence, so
+# difflib analyses every concept once instead of once per related term.
+def build_concept_index(ontology):
+    by_length = {}
+    for concept in set(ontology):
+        matcher = SequenceMatcher(None, '', concept)
+        by_length.setdefault(len(concept), []).append(matcher)
+    lengths = sorted(by_length)
+    return {"lengths": lengths, "by_length": by_length}
+
+# Function to check whether any indexed concept has string_similarity(term, concept) > threshold.
+# ratio() is 2*M/(len(a)+len(b)) with M <= min(len(a), len(b)), so concepts whose length
+# alone caps the ratio at the threshold are skipped; the rest go through quick_ratio()
+# (another upper bound) before the exact ratio(). The result equals the exhaustive scan.
+def matches_any_concept(term, concept_index, threshold=0.8):
+    return bool(concepts_matching(term, concept_index, threshold, first=True))
+
+# Function to list the indexed concepts with string_similarity(term, concept) > threshold,
+# stopping at the first one when first is set
+def concepts_matching(term, concept_index, threshold=0.8, first=False):
+    term_length = len(term)
+    lengths = concept_index["lengths"]
+    # 2*min/(la+lb) > t needs lb in (la*t/(2-t), la*(2-t)/t); widen by one for float safety
+    low = term_length * threshold / (2 - threshold) - 1
+    high = term_length * (2 - threshold) / threshold + 1 if threshold > 0 else float('inf')
+    found = []
+    for length in lengths[bisect_left(lengths, low):bisect_right(lengths, high)]:
+        total = term_length + length
+        if total and 2.0 * min(term_length, length) / total <= threshold:
+            continue
+        for matcher in concept_index["by_length"][length]:
+            matcher.set_seq1(term)
+            if matcher.quick_ratio() > threshold and matcher.ratio() > threshold:
+                found.append(matcher.b)
+                if first:
+                    return found
+    return found
 
+# Function to count the characters of strings, one column per string and one row per
+# character of alphabet (a sorted array of code points); other characters are ignored
+def character_counts(np, strings, alphabet):
+    lengths = np.fromiter(map(len, strings), dtype=np.int64, count=len(strings))
+    codes = np.frombuffer("".join(strings).encode("utf-32-le", errors="surrogatepass"), dtype=np.uint32)
+    owners = np.repeat(np.arange(len(strings)), lengths)
+    rows = np.minimum(np.searchsorted(alphabet, codes), len(alphabet) - 1)
+    known = alphabet[rows] == codes
+    counts = np.bincount(rows[known] * len(strings) + owners[known], minlength=len(alphabet) * len(strings))
+    return counts.reshape(len(alphabet), len(strings)).astype(np.int32)
+
+# Function to find, for many terms at once, the concepts each term matches.
+# Every term is compared with every concept through character-count vectors: the summed
+# minimum of two count vectors is difflib's quick_ratio() bound, computed for a whole
+# block of terms in one NumPy pass. Only pairs whose bound exceeds the threshold go
+# through the exact ratio(), so the matches equal concepts_matching() for every term.
+# Returns {term: [concept, ...]} for the terms that match; with first, one concept each.
+# Without NumPy the terms are checked one by one.
+def match_concepts(terms, ontology, threshold=0.8, first=False):
+    terms = list(dict.fromkeys(terms))
+    concepts = list(dict.fromkeys(ontology))
+    if not terms or not concepts:
+        return {}
+    try:
+        import numpy as np
+    except ImportError:
+        concept_index = build_concept_index(concepts)
+        matches = ((term, concepts_matching(term, concept_index, threshold, first)) for term in terms)
+        return {term: found for term, found in matches if found}
+
+    # Characters that no term contains cannot add to a match, so they get no row. With
+    # only empty terms, one unused row keeps the arrays well formed: an empty term then
+    # matches the empty concepts only, at ratio 1.0, as in concepts_matching().
+    alphabet = np.array(sorted(set(map(ord, "".join(terms)))) or [0], dtype=np.uint32)
+    term_counts = character_counts(np, terms, alphabet).T
+    concept_counts = character_counts(np, concepts, alphabet)
+    term_lengths = np.fromiter(map(len, terms), dtype=np.int64, count=len(terms))
+    concept_lengths = np.fromiter(map(len, concepts), dtype=np.int64, count=len(concepts))
+
+    matchers = {}
+    matches = {}
+    block_size = max(1, MATCH_BLOCK_CELLS // len(concepts))
+    for start in range(0, len(terms), block_size):
+        block = term_counts[start:start + block_size]
+        shared = np.zeros((len(block), len(concepts)), dtype=np.int32)
+        for row in range(len(alphabet)):
+            shared += np.minimum(block[:, row, None], concept_counts[row])
+        totals = term_lengths[start:start + block_size, None] + concept_lengths
+        bounds = np.where(totals > 0, 2.0 * shared / np.maximum(totals, 1), 1.0)
+        for row, candidates in enumerate(bounds > threshold):
+            term = terms[start + row]
+            # Most promising concepts first, so with first the search usually ends early
+            columns = np.flatnonzero(candidates)
+            for column in columns[np.argsort(-bounds[row, columns], kind="stable")]:
+                matcher = matchers.get(column)
+                if matcher is None:
+                    matcher = matchers[column] = SequenceMatcher(None, '', concepts[column])
+                matcher.set_seq1(term)
+                if matcher.ratio() > threshold:
+                    matches.setdefault(term, []).append(concepts[column])
+                    if first:
+                        break
+    return matches
+
+# Function to find the related terms that match some concept, for many terms at once
+def match_terms(terms, ontology, threshold=0.8):
+    return set(match_concepts(terms, ontology, threshold, first=True))
+
+# Function to build the result dictionary of the lexical metrics
+def lexical_result(related_terms, S, O):
+    D = len(related_terms)
     domain_coverage = (S / D) * 100 if D > 0 else 0
     ontology_relevance = (S / O) * 100 if O > 0 else 0
 
@@ -219,17 +217,68 @@ def calculate_metrics(input_term, ontology):
         'Ontology Relevance (S/O)': ontology_relevance,
     }
 
+# Function to calculate metrics based on the related words and ontology
+@instrumentation.timed("lexical")
+def calculate_metrics(input_term, ontology):
+    with instrumentation.span("lexical.expansion"):
+        related_terms = get_related_words(input_term)
+    D = len(related_terms)
+    with instrumentation.span("lexical.matching"):
+        concept_index = build_concept_index(ontology)
+        S = sum(1 for term in related_terms if matches_any_concept(term, concept_index, 0.8))
+    instrumentation.count("related_terms", D)
+    return lexical_result(related_terms, S, len(ontology))
+
+# Function to calculate the metrics of many keywords against one ontology. The keywords
+# are expanded concurrently, and every distinct related term is matched once, whichever
+# keywords it came from. Returns {keyword: calculate_metrics(keyword, ontology)}.
+@instrumentation.timed("lexical")
+def calculate_metrics_many(keywords, ontology):
+    keywords = list(dict.fromkeys(keywords))
+    if not keywords:
+        return {}
+    with instrumentation.span("lexical.expansion"):
+        with ThreadPoolExecutor(max_workers=min(EXPANSION_WORKERS, len(keywords))) as pool:
+            related = dict(zip(keywords, pool.map(get_related_words, keywords)))
+    with instrumentation.span("lexical.matching"):
+        matched = match_terms([term for terms in related.values() for term in terms], ontology, 0.8)
+    results = {}
+    for keyword, related_terms in related.items():
+        instrumentation.count("related_terms", len(related_terms))
+        S = sum(1 for term in related_terms if term in matched)
+        results[keyword] = lexical_result(related_terms, S, len(ontology))
+    return results
+
+def print_vocabulary_ranking(vocabulary_path, ontology_source):
+    # One line per keyword of the vocabulary file, best Domain Coverage first
+    with open(vocabulary_path, 'r') as file:
+        keywords = [line.strip() for line in file if line.strip() and not line.startswith('#')]
+    loaded = ontology_loader.load(ontology_source)
+    if not loaded or not loaded.terms:
+        print("No ontology loaded.")
+        return
+    results = calculate_metrics_many(keywords, loaded.terms)
+    print(f"{'keyword':<30} {'D':>5} {'S':>5} {'S/D':>8} {'S/O':>8}")
+    for keyword, metrics in sorted(results.items(), key=lambda item: -item[1]['Domain Coverage (S/D)']):
+        print(f"{keyword:<30} {metrics['Number of Related Terms (D)']:>5} {metrics['Number of Related Terms in Ontology (S)']:>5} "
+              f"{metrics['Domain Coverage (S/D)']:>7.2f}% {metrics['Ontology Relevance (S/O)']:>7.2f}%")
+
 if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--vocabulary":
+        print_vocabulary_ranking(sys.argv[2], sys.argv[3])
+        sys.exit(0)
     if len(sys.argv) < 3:
-        print("Usage: python lexical.py <input_term> <ontology_source>")
+        print("Usage: python lexical.py <input_term> <ontology_source> [--no-imports]")
+        print("       python lexical.py --vocabulary <keywords_file> <ontology_source>")
         sys.exit(1)
 
     input_term = sys.argv[1]
     ontology_source = sys.argv[2]
-    ontology, main_graph = load_ontology(ontology_source)
+    loaded = ontology_loader.load(ontology_source)
 
-    if ontology:
-        metrics = calculate_metrics(input_term, ontology)
+    terms = loaded.view_terms("--no-imports" not in sys.argv[3:]) if loaded else ()
+    if terms:
+        metrics = calculate_metrics(input_term, terms)
         print(f"Metrics for '{input_term}':")
         for key, value in metrics.items():
             if isinstance(value, float):
@@ -0,0 +1,160 @@
+import os
+import sys
+import json
+import time
+import argparse
+import ontology_loader
+import graph_cache
+import lexical
+import batch
+
+# Inverted index over a corpus of candidate ontologies. Each ontology is loaded once
+# when it is added; the index keeps, for every concept (the class local names the
+# lexical metrics use), the ontologies that contain it, plus the concept count O of each
+# ontology. Ranking a keyword expands it as calculate_metrics does and matches the
+# related terms against the distinct concepts of the whole corpus, so the Domain
+# Coverage and Ontology Relevance it reports equal calculate_metrics on each ontology,
+# without reading any ontology again.
+#
+# The index is one JSON file:
+# {"ontologies": {source: {"O", "signature", "content_key", "indexed"}},
+#  "concepts": {concept: [source, ...]}}
+INDEX_PATH = os.environ.get("ONTOREUSE_INDEX", "ontology_index.json")
+
+def empty_index():
+    return {"ontologies": {}, "concepts": {}}
+
+def load_index(path=None):
+    try:
+        with open(path or INDEX_PATH, 'r') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return empty_index()
+
+def save_index(index, path=None):
+    graph_cache.atomic_write(os.path.abspath(path or INDEX_PATH), json.dumps(index).encode("utf-8"))
+
+def file_signature(source):
+    # Size and modification time of a local file; None for URLs, which are revalidated
+    # through the graph cache instead
+    if ontology_loader.is_url(source):
+        return None
+    stat = os.stat(source)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def remove_source(index, source):
+    if index["ontologies"].pop(source, None) is None:
+        return False
+    concepts = index["concepts"]
+    for concept in [concept for concept, sources in concepts.items() if source in sources]:
+        concepts[concept].remove(source)
+        if not concepts[concept]:
+            del concepts[concept]
+    return True
+
+def add_source(index, source, force=False):
+    # Indexes source, replacing its previous entry. Returns "added", "updated",
+    # "unchanged" or "failed". Unchanged local files are not parsed again; URLs are
+    # loaded again, which costs a conditional request when the graph cache has them.
+    previous = index["ontologies"].get(source)
+    try:
+        signature = file_signature(source)
+    except OSError as e:
+        print(f"Failed to index {source}: {e}")
+        return "failed"
+    if previous and not force and signature is not None and previous["signature"] == signature:
+        return "unchanged"
+    loaded = ontology_loader.load(source)
+    if loaded is None:
+        return "failed"
+    if previous and not force and loaded.content_key and previous["content_key"] == loaded.content_key:
+        return "unchanged"
+    remove_source(index, source)
+    index["ontologies"][source] = {
+        "O": len(loaded.terms),
+        "signature": signature,
+        "content_key": loaded.content_key,
+        "indexed": time.time(),
+    }
+    for concept in loaded.terms:
+        index["concepts"].setdefault(concept, []).append(source)
+    return "updated" if previous else "added"
+
+def refresh(index, force=False):
+    # Re-indexes changed ontologies and drops local files that no longer exist
+    statuses = {}
+    for source in list(index["ontologies"]):
+        if not ontology_loader.is_url(source) and not os.path.exists(source):
+            remove_source(index, source)
+            statuses[source] = "removed"
+        else:
+            statuses[source] = add_source(index, source, force)
+    return statuses
+
+def rank(index, keyword):
+    # [(source, metrics)] for every indexed ontology, best Domain Coverage first; metrics
+    # holds the calculate_metrics values except the related-term list
+    related_terms = lexical.get_related_words(keyword)
+    matches = lexical.match_concepts(related_terms, index["concepts"], 0.8)
+    S = dict.fromkeys(index["ontologies"], 0)
+    for term in related_terms:
+        sources = set()
+        for concept in matches.get(term, ()):
+            sources.update(index["concepts"][concept])
+        for source in sources:
+            S[source] += 1
+    ranking = []
+    for source, entry in index["ontologies"].items():
+        metrics = lexical.lexical_result(related_terms, S[source], entry["O"])
+        del metrics['Related Terms']
+        ranking.append((source, metrics))
+    ranking.sort(key=lambda item: (item[1]['Domain Coverage (S/D)'], item[1]['Ontology Relevance (S/O)']), reverse=True)
+    return ranking
+
+def main():
+    parser = argparse.ArgumentParser(description="Index candidate ontologies and rank them for a keyword.")
+    parser.add_argument("--index", default=INDEX_PATH, help="index file (default: $ONTOREUSE_INDEX or ontology_index.json)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="index ontology files, URLs, directories or source lists")
+    add.add_argument("inputs", nargs="+")
+    add.add_argument("--force", action="store_true", help="re-index even when unchanged")
+    remove = commands.add_parser("remove", help="drop ontologies from the index")
+    remove.add_argument("sources", nargs="+")
+    update = commands.add_parser("update", help="re-index changed ontologies and drop deleted files")
+    update.add_argument("--force", action="store_true", help="re-index every ontology")
+    commands.add_parser("list", help="list the indexed ontologies")
+    rank_command = commands.add_parser("rank", help="rank the indexed ontologies for a keyword")
+    rank_command.add_argument("keyword")
+    rank_command.add_argument("--top", type=int, default=None)
+    args = parser.parse_args()
+
+    index = load_index(args.index)
+    if args.command == "add":
+        sources = [os.path.abspath(source) if not ontology_loader.is_url(source) else source
+                   for source in batch.collect_sources(args.inputs)]
+        for source in sources:
+            print(f"{add_source(index, source, args.force)}: {source}")
+        save_index(index, args.index)
+    elif args.command == "remove":
+        for source in args.sources:
+            key = source if source in index["ontologies"] or ontology_loader.is_url(source) else os.path.abspath(source)
+            print(f"{'removed' if remove_source(index, key) else 'not indexed'}: {source}")
+        save_index(index, args.index)
+    elif args.command == "update":
+        for source, status in refresh(index, args.force).items():
+            print(f"{status}: {source}")
+        save_index(index, args.index)
+    elif args.command == "list":
+        for source, entry in sorted(index["ontologies"].items()):
+            print(f"{source}: {entry['O']} concepts")
+    else:
+        start_time = time.perf_counter()
+        ranking = rank(index, args.keyword)
+        elapsed = time.perf_counter() - start_time
+        for position, (source, metrics) in enumerate(ranking[:args.top], 1):
+            print(f"{position}. {source}: Domain Coverage {metrics['Domain Coverage (S/D)']:.2f}%, "
+                  f"Ontology Relevance {metrics['Ontology Relevance (S/O)']:.2f}%")
+        print(f"Ranked {len(ranking)} ontologies in {elapsed:.3f} seconds.", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+import os
+import sys
+import time
+import threading
+import requests
+from rdflib import Dataset, URIRef, RDF, OWL, RDFS
+from rdflib.plugins.stores.memory import Memory
+from rdflib.plugins.serializers.nt import _nt_row
+import budgets
+import graph_cache
+import import_closure
+import rdf_formats
+import snapshot
+import upload
+import instrumentation
+
+log = instrumentation.get_logger("ontology_loader")
+
+# The one place ontologies are loaded, for the app, the batch runner and every CLI.
+# A URL, a local file or a spooled upload is parsed once (through the graph cache) into
+# a named graph of an rdflib Dataset, and so is every ontology of its owl:imports
+# closure. Imports are downloaded in parallel but parsed on the loading thread, straight
+# into their own named graph, so no triple is copied between graphs. The result is a
+# LoadedOntology that every evaluation stage reads from. Stages must not modify it.
+# Loading runs under a budgets.Budget: a main ontology over its download limit is
+# refused, and imports beyond its limits are left out and listed in truncated. The
+# triple limit is enforced by the store while parsing: the ontology that reaches it
+# keeps the triples parsed so far, and nothing after it is loaded.
+DOWNLOAD_ACCEPT = "text/turtle,application/rdf+xml;q=0.9,application/ld+json;q=0.8,application/n-triples;q=0.8"
+
+class BudgetStore(Memory):
+    # In-memory store that charges every added triple to a budgets.Budget, so a parse
+    # stops with budgets.TripleLimitReached as soon as the dataset is full
+    def __init__(self, budget):
+        super().__init__()
+        self.budget = budget
+
+    def add(self, triple, context, quoted=False):
+        # A triple the store already holds (e.g. in another named graph) adds nothing
+        if len(self) >= self.budget.max_triples and next(self.triples(triple, None), None) is None:
+            self.budget.check_triples(len(self) + 1)
+        super().add(triple, context, quoted)
+
+class LoadedOntology:
+    # Immutable record of a loaded ontology. dataset holds the main ontology and each
+    # import as named graphs, stored once; graph is the read-only union of them and
+    # main_graph the main ontology alone. timings holds the seconds spent on "download",
+    # "parse", "imports" and "total"; imports the per-import timings of
+    # import_closure.resolve_imports; truncated the budget truncations ({what: reason}).
+    __slots__ = ("source", "dataset", "graph", "main_graph", "terms", "main_terms", "base_iri", "format",
+                 "content_key", "imports", "timings", "truncated", "_reasoner_input", "_snapshots", "_lock")
+
+    def __init__(self, source, dataset, main_graph, base_iri, format, content_key, imports, timings, truncated=None):
+        for name, value in (("source", source), ("dataset", dataset), ("graph", dataset), ("main_graph", main_graph),
+                            ("terms", tuple(ontology_terms(dataset))), ("main_terms", tuple(ontology_terms(main_graph))),
+                            ("base_iri", base_iri), ("format", format), ("content_key", content_key),
+                            ("imports", imports), ("timings", timings), ("truncated", dict(truncated or {})),
+                            ("_reasoner_input", {}), ("_snapshots", {}),
+                            ("_lock", threading.Lock())):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("LoadedOntology is immutable")
+
+    @property
+    def load_time(self):
+        # Time to get the main ontology parsed, as reported by the structural results
+        return self.timings["download"] + self.timings["parse"]
+
+    def view(self, include_imports=True):
+        # The graph the metrics run on: the union with the imports, or the main ontology
+        return self.graph if include_imports else self.main_graph
+
+    def view_terms(self, include_imports=True):
+        return self.terms if include_imports else self.main_terms
+
+    def snapshot(self, include_imports=True):
+        # snapshot.GraphSnapshot of view(), built once and shared by the metrics, or None
+        # without NumPy
+        with self._lock:
+            if include_imports not in self._snapshots:
+                with instrumentation.span("snapshot"):
+                    self._snapshots[include_imports] = snapshot.build(self.view(include_imports))
+            return self._snapshots[include_imports]
+
+    def reasoner_input(self, include_imports=True):
+        # N-Triples serialization of view() for owlready2, built once and shared by
+        # every consistency check of this ontology. owlready2 reads N-Triples faster
+        # than RDF/XML, and rdflib writes it several times faster. The rows come from
+        # triples(), which lists a triple once however many named graphs hold it;
+        # serializing the Dataset itself would repeat it per graph.
+        with self._lock:
+            if include_imports not in self._reasoner_input:
+                triples = self.view(include_imports).triples((None, None, None))
+                self._reasoner_input[include_imports] = "".join(map(_nt_row, triples)).encode("utf-8")
+            return self._reasoner_input[include_imports]
+
+def is_url(source):
+    return source.startswith('http://') or source.startswith('https://')
+
+def count_elements(graph):
+    # graph may be a snapshot.GraphSnapshot, counted with array set operations
+    if isinstance(graph, snapshot.GraphSnapshot):
+        return count_snapshot_elements(graph)
+    classes = set(graph.subjects(RDF.type, OWL.Class))
+    object_properties = set(graph.subjects(RDF.type, OWL.ObjectProperty))
+
+    for s, p, o in graph.triples((None, RDF.type, OWL.Restriction)):
+        for sub, prop, obj in graph.triples((s, OWL.onProperty, None)):
+            if (obj, RDF.type, OWL.ObjectProperty) in graph:
+                object_properties.add(obj)
+            elif (obj, RDF.type, OWL.Class) in graph:
+                classes.add(obj)
+
+    return len(object_properties), len(classes)
+
+def count_snapshot_elements(graph):
+    np = graph.np
+    classes = graph.typed(OWL.Class)
+    object_properties = graph.typed(OWL.ObjectProperty)
+    restricted, properties = graph.subject_objects(OWL.onProperty)
+    properties = properties[np.isin(restricted, graph.typed(OWL.Restriction))]
+    object_properties = np.union1d(object_properties, properties[np.isin(properties, object_properties)])
+    classes = np.union1d(classes, properties[np.isin(properties, classes)])
+    return len(object_properties), len(classes)
+
+def ontology_terms(graph):
+    # Local names of the classes, the concepts the lexical metrics match against
+    terms = set()
+    for s in graph.subjects(RDF.type, OWL.Class):
+        terms.add(str(s).split('/')[-1])
+    for s in graph.subjects(RDF.type, RDFS.Class):
+        terms.add(str(s).split('/')[-1])
+    return sorted(terms)
+
+def find_base_url(lines):
+    # Base URL from the @base or imports: line of a local ontology
+    base_url = None
+    for line in lines:
+        if line.startswith('@base'):
+            base_url = line.split('<')[1].split('>')[0]
+            break
+        if "imports:" in line:
+            base_url = line.split(':')[1].strip()
+            if base_url.startswith('<') and base_url.endswith('>'):
+                base_url = base_url[1:-1]
+    return base_url
+
+def truncate_triples(budget, what, source):
+    budget.truncate(what, f"{source} loaded only up to the limit of {budget.max_triples} triples")
+
+def parse_fetched(url, fetched, graph=None, budget=None, what="triples"):
+    # (graph, format, content key, parse time) for a response of graph_cache.revalidate.
+    # The format comes from the content, the Content-Type and the URL, in that order.
+    # When graph reaches the triple limit, it keeps what was parsed, recorded under what.
+    response, key = fetched
+    format, start_time = None, time.perf_counter()
+    try:
+        if key is not None:
+            format = (graph_cache.load_url_index().get(url) or {}).get("format")
+            cached = graph_cache.read_entry(key, graph)
+            if cached is not None:
+                return cached, format, key, 0.0
+            # The cache entry was evicted meanwhile; fetch the content again
+            response, _ = graph_cache.fetch(url, {"Accept": DOWNLOAD_ACCEPT}, budget=budget)
+        format = rdf_formats.detect_format(response.content[:rdf_formats.SNIFF_BYTES], response.headers.get("Content-Type"), url)
+        with instrumentation.span("parse") as parse_span:
+            graph = graph_cache.parse_data(response.content, format, url=url, response=response, graph=graph)
+    except budgets.TripleLimitReached:
+        # A partial parse is neither cached nor indexed, so it has no content key
+        truncate_triples(budget, what, url)
+        return graph, format, None, time.perf_counter() - start_time
+    log.debug("Ontology parsed from %s in %.8f seconds, %d triples.", url, parse_span.elapsed, len(graph))
+    entry = graph_cache.load_url_index().get(url)
+    return graph, format, entry["key"] if entry else None, parse_span.elapsed
+
+def fetch(url, budget=None):
+    # Network part of a download, safe to run on any thread: (response, cache key)
+    with instrumentation.span("download"):
+        return graph_cache.revalidate(url, {"Accept": DOWNLOAD_ACCEPT}, budget)
+
+def download(url, graph=None, budget=None):
+    # (graph, format, content key, parse time) for url, parsed into graph when given, or
+    # (None, None, None, 0) when it cannot be downloaded or parsed
+    try:
+        return parse_fetched(url, fetch(url, budget), graph, budget)
+    except (requests.exceptions.RequestException, budgets.BudgetExceeded) as e:
+        print(f"Failed to download ontology from {url}: {e}")
+    except Exception as e:
+        print(f"Failed to parse ontology from {url}: {e}")
+    return None, None, None, 0.0
+
+def download_and_parse_ontology(url):
+    # Graph of url or None, for import_closure.resolve_imports without a Dataset
+    return download(url)[0]
+
+def load_import(dataset, iri, fetched, budget):
+    # Parses a fetched import straight into its own named graph of dataset. An import
+    # that reaches the triple limit keeps the triples parsed up to it.
+    graph = dataset.graph(URIRef(iri))
+    try:
+        parse_fetched(iri, fetched, graph, budget, "imports")
+    except Exception:
+        dataset.remove_graph(graph)
+        raise
+    if not len(graph):
+        dataset.remove_graph(graph)
+        return None
+    return graph
+
+def finish(source, dataset, main_graph, base_iri, format, content_key, timings, start_time, budget):
+    # Resolves the imports of a parsed main graph and wraps everything in a LoadedOntology
+    if main_graph is None or not len(main_graph):
+        print("Failed to load the ontology.")
+        return None
+    log.info("Ontology has %d triples.", len(main_graph))
+    imports = {}
+    if base_iri and budget.triple_limit_reached:
+        budget.truncate("imports", "not loaded: the main ontology reached the triple limit")
+    elif base_iri:
+        with instrumentation.span("imports") as imports_span:
+            imports = import_closure.resolve_imports(main_graph, base_iri, lambda iri: fetch(iri, budget),
+                                                     load=lambda iri, fetched: load_import(dataset, iri, fetched, budget),
+                                                     budget=budget)
+        timings["imports"] = imports_span.elapsed
+        for iri, timing in imports.items():
+            log.debug("Import %s (depth %d) loaded in %.8f seconds, %d triples.", iri, timing['depth'], timing['time'], timing['triples'])
+    loaded = LoadedOntology(source, dataset, main_graph, base_iri, format, content_key, imports, timings, budget.truncated)
+    object_properties_count, classes_count = count_elements(loaded.snapshot() or dataset)
+    instrumentation.count("triples", len(dataset))
+    instrumentation.count("classes", classes_count)
+    instrumentation.count("object_properties", object_properties_count)
+    log.info("Total - Object Properties: %d, Classes: %d", object_properties_count, classes_count)
+    timings["total"] = time.perf_counter() - start_time
+    return loaded
+
+def new_dataset(main_iri, budget):
+    # Dataset whose default graph is the union of its named graphs, and the empty named
+    # graph the main ontology is parsed into. Its store enforces the triple limit of budget.
+    dataset = Dataset(store=BudgetStore(budget) if budget.max_triples is not None else "default", default_union=True)
+    return dataset, dataset.graph(URIRef(main_iri))
+
+@instrumentation.timed("load")
+def load(source, budget=None):
+    # LoadedOntology for a URL or a local file path, or None when it cannot be loaded.
+    # budget defaults to a budgets.Budget with the configured limits.
+    if not source:
+        print("No source provided for ontology.")
+        return None
+    log.info("Loading ontology from source: %s", source)
+    start_time = time.perf_counter()
+    timings = {"download": 0.0, "parse": 0.0, "imports": 0.0}
+    budget = budget or budgets.Budget()
+    if is_url(source):
+        dataset, main_graph = new_dataset(source, budget)
+        graph, format, content_key, timings["parse"] = download(source, main_graph, budget)
+        timings["download"] = time.perf_counter() - start_time - timings["parse"]
+        base_iri = source.rsplit('/', 1)[0] + '/' if graph else None
+        return finish(source, dataset, graph, base_iri, format, content_key, timings, start_time, budget)
+
+    dataset, main_graph = new_dataset("file://" + os.path.abspath(source), budget)
+    try:
+        with open(source, 'rb') as file:
+            head = file.read(rdf_formats.SNIFF_BYTES)
+        format = rdf_formats.detect_format(head, None, source)
+        with instrumentation.span("parse") as parse_span:
+            graph_cache.parse_file(source, format, main_graph)
+    except budgets.TripleLimitReached:
+        truncate_triples(budget, "triples", source)
+    except FileNotFoundError:
+        print("The file path is not correct. Please provide a valid file path.")
+        return None
+    except Exception as e:
+        print(f"Failed to parse ontology from {source}: {e}")
+        return None
+    timings["parse"] = parse_span.elapsed
+    log.debug("Ontology parsed from file in %.8f seconds.", parse_span.elapsed)
+    base_iri = find_base_url(head.decode("utf-8", errors="replace").splitlines())
+    return finish(source, dataset, main_graph, base_iri, format, None, timings, start_time, budget)
+
+@instrumentation.timed("load")
+def load_upload(spooled, budget=None):
+    # LoadedOntology for an upload spooled by upload.spool_upload. The base URL is
+    # looked up in the first chunk only, so the upload is read once.
+    start_time = time.perf_counter()
+    timings = {"download": 0.0, "parse": 0.0, "imports": 0.0}
+    budget = budget or budgets.Budget()
+    dataset, main_graph = new_dataset(spooled["public_id"] or f"urn:ontoreuse:upload:{spooled['key']}", budget)
+    try:
+        with instrumentation.span("parse") as parse_span:
+            upload.parse_upload(spooled, main_graph)
+    except budgets.TripleLimitReached:
+        truncate_triples(budget, "triples", spooled["filename"] or "the upload")
+    except Exception as e:
+        print(f"Failed to parse the uploaded ontology: {e}")
+        return None
+    timings["parse"] = parse_span.elapsed
+    base_iri = find_base_url(spooled["head"].decode("utf-8", errors="replace").splitlines())
+    return finish(spooled["filename"] or spooled["public_id"], dataset, main_graph, base_iri, spooled["format"], spooled["key"], timings, start_time, budget)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python ontology_loader.py <ontology_source>")
+        sys.exit(1)
+    loaded = load(sys.argv[1])
+    if loaded is None:
+        sys.exit(1)
+    print(f"Triples: {len(loaded.graph)}, terms: {len(loaded.terms)}, format: {loaded.format}, base IRI: {loaded.base_iri}")
+    for name, seconds in loaded.timings.items():
+        print(f"{name}: {seconds:.6f} seconds")
+    for iri, timing in loaded.imports.items():
+        print(f"import {iri}: depth {timing['depth']}, {timing['triples']} triples, {timing['time']:.6f} seconds")
+    for what, reason in loaded.truncated.items():
+        print(f"truncated {what}: {reason}")
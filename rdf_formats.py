@@ -0,0 +1,74 @@
+import os
+import re
+
+# RDF serialization detection for uploads and local files. The first SNIFF_BYTES of
+# the content decide when they are conclusive (XML and JSON are recognisable from
+# their first character, Turtle from its directives, N-Triples from every line being
+# a triple); otherwise the declared media type, then the file extension decide.
+SNIFF_BYTES = 64 * 1024
+
+FORMAT_BY_MEDIA_TYPE = {
+    "text/turtle": "turtle",
+    "application/x-turtle": "turtle",
+    "application/rdf+xml": "xml",
+    "application/xml": "xml",
+    "text/xml": "xml",
+    "application/ld+json": "json-ld",
+    "application/json": "json-ld",
+    "application/n-triples": "nt",
+    "text/n3": "n3",
+    "text/rdf+n3": "n3",
+}
+
+FORMAT_BY_EXTENSION = {
+    ".ttl": "turtle",
+    ".owl": "xml",
+    ".rdf": "xml",
+    ".xml": "xml",
+    ".jsonld": "json-ld",
+    ".json": "json-ld",
+    ".nt": "nt",
+    ".n3": "n3",
+}
+
+# An element only counts when an attribute follows its name (RDF/XML has to declare its
+# namespaces), so Turtle and N-Triples starting with an IRI such as <urn:a> or <x> do not
+XML_START = re.compile(rb'<(\?xml|!DOCTYPE|!--|[A-Za-z_][\w.\-]*(:[A-Za-z_][\w.\-]*)?\s+[A-Za-z_][\w.\-]*(:[A-Za-z_][\w.\-]*)?\s*=)')
+TURTLE_DIRECTIVE = re.compile(rb'^\s*(@prefix|@base|PREFIX\s|BASE\s)', re.MULTILINE | re.IGNORECASE)
+NTRIPLES_LINE = re.compile(rb'^(<[^>\s]*>|_:\S+)\s+<[^>\s]*>\s+(<[^>\s]*>|_:\S+|".*)\s*\.\s*(#.*)?$')
+
+class UnsupportedFormat(ValueError):
+    pass
+
+def sniff(head):
+    # Format named by the content itself, or None when the head is not conclusive
+    text = head.lstrip(b"\xef\xbb\xbf \t\r\n")
+    if not text:
+        return None
+    if XML_START.match(text):
+        if re.search(rb'<(\w+:)?Ontology[\s>]', text) and not re.search(rb'<(\w+:)?RDF[\s>]', text):
+            raise UnsupportedFormat("OWL/XML is not supported; convert the ontology to RDF/XML or Turtle.")
+        return "xml"
+    if text[:1] in (b"{", b"["):
+        return "json-ld"
+    if TURTLE_DIRECTIVE.search(text):
+        return "turtle"
+    return None
+
+def looks_like_ntriples(head):
+    # Every complete line (the last one may be cut off by the sniff window) is a triple or a comment
+    lines = [line.strip() for line in head.splitlines()[:-1] if line.strip()]
+    return bool(lines) and all(line.startswith(b"#") or NTRIPLES_LINE.match(line) for line in lines)
+
+def detect_format(head, media_type=None, filename=None):
+    # rdflib parser name for content starting with head
+    media_type = (media_type or "").split(";")[0].strip().lower()
+    extension = os.path.splitext(filename or "")[1].lower()
+    declared = FORMAT_BY_MEDIA_TYPE.get(media_type) or FORMAT_BY_EXTENSION.get(extension)
+    format = sniff(head)
+    if format:
+        # N3 uses the Turtle directives too, and its parser reads Turtle
+        return "n3" if format == "turtle" and declared == "n3" else format
+    if looks_like_ntriples(head):
+        return "nt"
+    return declared or "turtle"
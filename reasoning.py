@@ -0,0 +1,232 @@
+import os
+import io
+import json
+import time
+import signal
+import hashlib
+import tempfile
+import functools
+import threading
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import budgets
+import graph_cache
+
+# Consistency checking with Pellet, run in a pool of worker processes. Every check
+# gets its own owlready2 World, so concurrent evaluations neither share nor pollute
+# the global default world, and results are cached by graph hash. A check can be given
+# a timeout: Pellet's JVM is killed when it runs longer, and the check raises
+# budgets.BudgetExceeded. Workers run under the budgets memory ceiling, which they share
+# with the JVM: its heap is capped with -Xmx instead of the worker's address-space limit.
+# A check that is cancelled (e.g. with its job) stops waiting at once and kills the JVM,
+# whose pid the worker leaves in a file. The input graph already holds the import
+# closure, so owlready2 is never let to fetch owl:imports itself.
+REASONER_WORKERS = int(os.environ.get("ONTOREUSE_REASONER_WORKERS", 2))
+RESULT_DIR = os.path.join(graph_cache.CACHE_DIR, "reasoning")
+OWL_IMPORTS = b"<http://www.w3.org/2002/07/owl#imports>"
+# Seconds between checks for cancellation while a check waits for its worker
+CANCEL_POLL = 0.25
+# Rough cost of canonical_hash as a multiple of quick_hash, which sorts the same triples;
+# with a timeout, the canonical hash is skipped when it would not fit in the time left
+CANONICAL_HASH_COST = 100
+
+_pool = None
+_pool_lock = threading.Lock()
+_results = {}
+
+def reasoner_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn rather than fork: the web app calls this from worker threads
+            _pool = ProcessPoolExecutor(max_workers=REASONER_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=budgets.limit_memory)
+        return _pool
+
+def quick_hash(graph):
+    # Exact digest of the triples as they are. Identical when the graph comes from the
+    # same parse or the parsed-graph cache, but blank node ids make it parse-dependent.
+    digest = hashlib.sha256()
+    for line in sorted(f"{s.n3()} {p.n3()} {o.n3()}" for s, p, o in graph.triples((None, None, None))):
+        digest.update(line.encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+def canonical_hash(graph):
+    # Blank-node independent digest: equal for any two isomorphic graphs. The triples
+    # are read through triples() so that a Dataset union view works as well.
+    from rdflib.compare import IsomorphicGraph
+    isomorphic = IsomorphicGraph()
+    isomorphic.addN((s, p, o, isomorphic) for s, p, o in graph.triples((None, None, None)))
+    return format(isomorphic.graph_digest(), "x")
+
+def cached_result(key):
+    if key in _results:
+        return _results[key]
+    try:
+        with open(os.path.join(RESULT_DIR, key + ".json"), 'r') as file:
+            result = tuple(json.load(file))
+    except (FileNotFoundError, ValueError):
+        return None
+    _results[key] = result
+    return result
+
+def store_result(keys, result):
+    for key in keys:
+        _results[key] = result
+        try:
+            graph_cache.atomic_write(os.path.join(RESULT_DIR, key + ".json"), json.dumps(list(result)).encode("utf-8"))
+        except OSError as e:
+            print(f"Failed to write reasoning cache entry: {e}")
+
+def java_preexec(pid_path):
+    # Runs in the JVM process before exec. The pid file is opened without creating it:
+    # once a cancelled check has removed it, the JVM does not start at all.
+    if budgets.memory_limited():
+        budgets.lift_memory_limit()
+    if pid_path:
+        with open(pid_path, 'r+') as file:
+            file.write(str(os.getpid()))
+
+def configure_java(timeout, pid_path=None):
+    # owlready2 passes _subprocess_kargs on to the subprocess.run that starts Pellet, so
+    # a timeout there kills the JVM, and a preexec_fn lifts the worker memory ceiling
+    # for it and records its pid. The JVM heap gets its share of the ceiling,
+    # budgets.java_memory(), through JAVA_MEMORY (-Xmx, in MB).
+    from owlready2 import reasoning as owlready_reasoning
+    options = owlready_reasoning._subprocess_kargs
+    options.pop("timeout", None)
+    options.pop("preexec_fn", None)
+    if timeout is not None:
+        options["timeout"] = timeout
+    if budgets.memory_limited() or pid_path:
+        options["preexec_fn"] = functools.partial(java_preexec, pid_path)
+    if budgets.memory_limited():
+        owlready_reasoning.JAVA_MEMORY = budgets.java_memory()
+
+def strip_imports(data):
+    # N-Triples data without its owl:imports triples. owlready2 would fetch every import
+    # again while loading, although the caller has already merged the import closure.
+    if OWL_IMPORTS not in data:
+        return data
+    return b"".join(line for line in data.splitlines(keepends=True) if line.split(b" ", 2)[1:2] != [OWL_IMPORTS])
+
+def reason(data, format="ntriples", timeout=None, pid_path=None):
+    # Runs in a worker process. data is the graph serialized in the owlready2 format
+    # ("ntriples", or "rdfxml" without owl:imports), loaded straight from memory. Pellet
+    # is stopped after timeout seconds; pid_path is an existing empty file that receives
+    # the JVM pid.
+    from owlready2 import World, sync_reasoner_pellet, OwlReadyInconsistentOntologyError
+    configure_java(timeout, pid_path)
+    if format == "ntriples":
+        data = strip_imports(data)
+    world = World()
+    try:
+        world.get_ontology("http://ontoreuse.local/reasoning.owl").load(fileobj=io.BytesIO(data), format=format)
+        start_time = time.perf_counter()
+        try:
+            sync_reasoner_pellet(world, infer_property_values=True)
+        except OwlReadyInconsistentOntologyError:
+            return 0, 0
+        except subprocess.TimeoutExpired:
+            raise budgets.BudgetExceeded(f"reasoning stopped after {timeout:g} seconds")
+        return 1, time.perf_counter() - start_time
+    finally:
+        world.close()
+
+def java_pid_file():
+    # Empty file for reason() to record the JVM pid in, on platforms with preexec_fn
+    if os.name != "posix":
+        return None
+    fd, path = tempfile.mkstemp(prefix="ontoreuse-pellet-", suffix=".pid")
+    os.close(fd)
+    return path
+
+def kill_java(pid_path):
+    # Removes the pid file, so a JVM not started yet never starts, and kills a running one
+    try:
+        with open(pid_path, 'r') as file:
+            os.remove(pid_path)
+            pid = file.read().strip()
+        if pid:
+            os.kill(int(pid), signal.SIGKILL)
+    except (OSError, ValueError):
+        pass
+
+def wait_for_result(future, timeout, cancelled):
+    # future.result(timeout), giving up with budgets.BudgetExceeded once cancelled is set
+    if cancelled is None:
+        return future.result(timeout)
+    end = None if timeout is None else time.monotonic() + timeout
+    while True:
+        wait_time = CANCEL_POLL if end is None else max(0, min(CANCEL_POLL, end - time.monotonic()))
+        try:
+            return future.result(wait_time)
+        except TimeoutError:
+            if cancelled.is_set():
+                raise budgets.BudgetExceeded("reasoning cancelled")
+            if end is not None and time.monotonic() >= end:
+                raise
+
+def check_consistency(graph, serialized=None, timeout=None, cancelled=None):
+    # Returns (1, reasoning_time) when consistent and (0, 0) when inconsistent.
+    # Errors are raised, not cached. serialized, when given, returns the graph as
+    # N-Triples (e.g. LoadedOntology.reasoner_input) and replaces serializing graph.
+    # Only graph itself is reasoned over: its owl:imports are not fetched.
+    # With timeout, a check that is not cached and does not finish in time raises
+    # budgets.BudgetExceeded, and so does one stopped through the cancelled Event.
+    # Hashing and serializing count against timeout: Pellet gets what is left of it.
+    if timeout is not None and timeout <= 0:
+        raise budgets.BudgetExceeded("no time left for reasoning")
+    end = None if timeout is None else time.monotonic() + timeout
+    start_time = time.monotonic()
+    keys = [quick_hash(graph)]
+    result = cached_result(keys[0])
+    if result is not None:
+        return result
+    if end is None or end - time.monotonic() > (time.monotonic() - start_time) * CANONICAL_HASH_COST:
+        keys.append(canonical_hash(graph))
+        result = cached_result(keys[1])
+        if result is not None:
+            store_result(keys[:1], result)
+            return result
+
+    data = serialized() if serialized is not None else graph.serialize(format="nt", encoding="utf-8")
+    if end is not None:
+        timeout = end - time.monotonic()
+        if timeout <= 0:
+            raise budgets.BudgetExceeded("no time left for reasoning")
+    if multiprocessing.parent_process() is not None:
+        # Already in a worker process (e.g. a batch evaluation), which is isolated enough
+        result = tuple(reason(data, "ntriples", timeout))
+        store_result(keys, result)
+        return result
+
+    pool = reasoner_pool()
+    pid_path = java_pid_file() if cancelled is not None else None
+    future = pool.submit(reason, data, "ntriples", timeout, pid_path)
+    try:
+        result = tuple(wait_for_result(future, timeout, cancelled))
+    except TimeoutError:
+        # The worker stops Pellet on its own; one still waiting for a worker never starts
+        future.cancel()
+        raise budgets.BudgetExceeded(f"reasoning did not finish within {timeout:g} seconds")
+    except budgets.BudgetExceeded:
+        # Cancelled: a check still waiting for a worker never starts; a running one loses its JVM
+        if cancelled is not None and cancelled.is_set() and not future.cancel() and pid_path:
+            kill_java(pid_path)
+        raise
+    except BrokenProcessPool:
+        # A worker died (e.g. the JVM took it down); start a fresh pool for the next check
+        global _pool
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        raise
+    finally:
+        if pid_path and os.path.exists(pid_path):
+            os.remove(pid_path)
+    store_result(keys, result)
+    return result
@@ -0,0 +1,89 @@
+from rdflib import RDF, RDFS, OWL
+
+# Read-only, integer-interned copy of the part of an rdflib graph the metrics read.
+# Every term is stored once and the triples become three NumPy integer columns sorted
+# by (predicate, object, subject), so the subjects of a (predicate, object) pair and the
+# pairs of a predicate are contiguous slices found with one searchsorted. Class and
+# property sets come out as sorted id arrays, on which the metric code works with
+# NumPy set operations instead of building Python sets of rdflib terms.
+#
+# Only the METRIC_PREDICATES triples are kept. NumPy is imported when a snapshot is
+# built; build() returns None without it, and callers fall back to the rdflib graph.
+METRIC_PREDICATES = (RDF.type, RDFS.subClassOf, OWL.onProperty)
+
+def build(graph, predicates=METRIC_PREDICATES):
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return GraphSnapshot(numpy, graph, predicates)
+
+class GraphSnapshot:
+    def __init__(self, np, graph, predicates=METRIC_PREDICATES):
+        self.np = np
+        ids = {}
+        subjects, predicate_ids, objects = [], [], []
+        for predicate in predicates:
+            predicate_id = ids.setdefault(predicate, len(ids))
+            for s, _, o in graph.triples((None, predicate, None)):
+                subjects.append(ids.setdefault(s, len(ids)))
+                objects.append(ids.setdefault(o, len(ids)))
+            predicate_ids.extend([predicate_id] * (len(subjects) - len(predicate_ids)))
+        self.ids = ids
+        self.terms = list(ids)
+        s = np.array(subjects, dtype=np.int64)
+        p = np.array(predicate_ids, dtype=np.int64)
+        o = np.array(objects, dtype=np.int64)
+        order = np.lexsort((s, o, p))
+        s, p, o = s[order], p[order], o[order]
+        # A Dataset union may yield a triple once per named graph holding it
+        if len(s):
+            distinct = np.ones(len(s), dtype=bool)
+            distinct[1:] = (s[1:] != s[:-1]) | (p[1:] != p[:-1]) | (o[1:] != o[:-1])
+            s, p, o = s[distinct], p[distinct], o[distinct]
+        self.subject_column = s
+        self.object_column = o
+        # (predicate, object) as one sorted int64 key per row
+        self.keys = p * len(self.terms) + o
+
+    def __len__(self):
+        return len(self.keys)
+
+    def id(self, term):
+        # Unknown terms map to None, which matches nothing
+        return self.ids.get(term)
+
+    def term(self, term_id):
+        return self.terms[term_id]
+
+    def key_range(self, low, high):
+        return self.np.searchsorted(self.keys, low, "left"), self.np.searchsorted(self.keys, high, "left")
+
+    def subjects(self, predicate, object):
+        # Sorted, distinct subject ids of the (predicate, object) triples
+        p, o = self.id(predicate), self.id(object)
+        if p is None or o is None:
+            return self.subject_column[:0]
+        key = p * len(self.terms) + o
+        start, end = self.key_range(key, key + 1)
+        return self.subject_column[start:end]
+
+    def subject_objects(self, predicate):
+        # (subject ids, object ids) of the predicate's triples, sorted by object
+        p = self.id(predicate)
+        if p is None:
+            return self.subject_column[:0], self.object_column[:0]
+        start, end = self.key_range(p * len(self.terms), (p + 1) * len(self.terms))
+        return self.subject_column[start:end], self.object_column[start:end]
+
+    def typed(self, *types):
+        # Sorted, distinct ids of the subjects with an rdf:type among types
+        return self.np.unique(self.np.concatenate([self.subjects(RDF.type, type) for type in types]))
+
+    def group(self, keys, values):
+        # {key: set of values} for two parallel id arrays, as plain Python ints
+        order = self.np.argsort(keys, kind="stable")
+        keys, values = keys[order], values[order].tolist()
+        distinct, starts = self.np.unique(keys, return_index=True)
+        ends = starts[1:].tolist() + [len(values)]
+        return {key: set(values[start:end]) for key, start, end in zip(distinct.tolist(), starts.tolist(), ends)}
@@ -0,0 +1,139 @@
+import os
+import sys
+import math
+import time
+import argparse
+import threading
+import statistics
+from rdflib import RDF, RDFS, OWL, XSD
+import instrumentation
+
+# SPARQL query benchmark used by structural.execute_queries. Each query is parsed and
+# translated to algebra once per process (prepareQuery) and then run QUERY_WARMUP
+# untimed and QUERY_ITERATIONS timed times, so the reported times are evaluation only.
+#
+# A workload file holds SPARQL queries separated by lines containing only "---". A
+# "# name: <name>" line inside a query names it; otherwise queries are numbered.
+# ONTOREUSE_QUERY_WORKLOAD points the app at a workload file instead of the defaults.
+QUERY_WARMUP = int(os.environ.get("ONTOREUSE_QUERY_WARMUP", 1))
+QUERY_ITERATIONS = int(os.environ.get("ONTOREUSE_QUERY_ITERATIONS", 5))
+QUERY_WORKLOAD = os.environ.get("ONTOREUSE_QUERY_WORKLOAD")
+QUERY_NAMESPACES = {"rdf": RDF, "rdfs": RDFS, "owl": OWL, "xsd": XSD}
+
+DEFAULT_QUERIES = [
+    ("1", """
+        SELECT ?class WHERE {
+            ?class a owl:Class .
+        }
+        """),
+    ("2", """
+        SELECT ?property WHERE {
+            ?property a owl:ObjectProperty .
+        }
+        """),
+    ("3", """
+        SELECT ?subject ?predicate ?object WHERE {
+            ?subject ?predicate ?object .
+        } LIMIT 100
+        """),
+]
+
+_prepared = {}
+_prepared_lock = threading.Lock()
+
+def prepared_query(text):
+    with _prepared_lock:
+        query = _prepared.get(text)
+    if query is None:
+        # The SPARQL parser takes a noticeable part of start-up, so it is loaded on first use
+        from rdflib.plugins.sparql import prepareQuery
+        query = prepareQuery(text, initNs=QUERY_NAMESPACES)
+        with _prepared_lock:
+            _prepared[text] = query
+    return query
+
+def load_workload(path):
+    # [(name, query text)] from a workload file
+    with open(path, 'r') as file:
+        blocks = file.read().split("\n---\n")
+    queries = []
+    for block in blocks:
+        name = None
+        lines = []
+        for line in block.strip().splitlines():
+            if line.strip().lower().startswith("# name:"):
+                name = line.split(":", 1)[1].strip()
+            elif line.strip() != "---":
+                lines.append(line)
+        text = "\n".join(lines).strip()
+        if text:
+            queries.append((name or str(len(queries) + 1), text))
+    return queries
+
+def workload():
+    return load_workload(QUERY_WORKLOAD) if QUERY_WORKLOAD else DEFAULT_QUERIES
+
+def percentile(sorted_times, fraction):
+    # Nearest-rank percentile
+    return sorted_times[max(0, math.ceil(fraction * len(sorted_times)) - 1)]
+
+def benchmark_query(graph, query, warmup=None, iterations=None, stop=None):
+    # Once stop() is true no further run starts, but one timed run always happens;
+    # "iterations" is the number of timed runs made
+    warmup = QUERY_WARMUP if warmup is None else warmup
+    iterations = max(1, QUERY_ITERATIONS if iterations is None else iterations)
+    for _ in range(warmup):
+        if stop is not None and stop():
+            break
+        rows = len(list(graph.query(query)))
+    times = []
+    for _ in range(iterations):
+        if times and stop is not None and stop():
+            break
+        start_time = time.perf_counter()
+        rows = len(list(graph.query(query)))
+        times.append(time.perf_counter() - start_time)
+    times.sort()
+    return {
+        "min": times[0],
+        "median": statistics.median(times),
+        "p95": percentile(times, 0.95),
+        "iterations": len(times),
+        "rows": rows,
+    }
+
+def run_workload(graph, queries=None, warmup=None, iterations=None, stop=None):
+    # [{"name", "min", "median", "p95", "iterations", "rows"}] for every query run;
+    # the queries left once stop() is true (e.g. budgets.Budget.expired) are not run
+    results = []
+    for name, text in queries or workload():
+        if stop is not None and stop():
+            break
+        with instrumentation.span(f"query.{name}"):
+            stats = benchmark_query(graph, prepared_query(text), warmup, iterations, stop)
+        stats["name"] = name
+        results.append(stats)
+    return results
+
+def main():
+    import ontology_loader
+
+    parser = argparse.ArgumentParser(description="Benchmark SPARQL queries against an ontology.")
+    parser.add_argument("ontology_source")
+    parser.add_argument("workload", nargs="?", help="workload file (default: the three built-in queries)")
+    parser.add_argument("--warmup", type=int, default=QUERY_WARMUP)
+    parser.add_argument("--iterations", type=int, default=QUERY_ITERATIONS)
+    args = parser.parse_args()
+
+    loaded = ontology_loader.load(args.ontology_source)
+    if not loaded:
+        print("No ontology loaded.")
+        sys.exit(1)
+    graph = loaded.graph
+    queries = load_workload(args.workload) if args.workload else None
+    print(f"{'query':<20} {'rows':>8} {'min':>10} {'median':>10} {'p95':>10}")
+    for stats in run_workload(graph, queries, args.warmup, args.iterations):
+        print(f"{stats['name']:<20} {stats['rows']:>8} {stats['min']:>10.6f} {stats['median']:>10.6f} {stats['p95']:>10.6f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import sys
+import time
+import tracemalloc
+from rdflib import Graph, RDF, RDFS, OWL
+from rdflib.store import Store
+import structural
+
+# Streaming structural evaluation. The parser writes into MetricStore instead of an
+# in-memory graph: every triple is inspected once and dropped unless the structural
+# metrics need it, and the kept ones are stored as interned integer ids. For
+# N-Triples rdflib reads the input line by line, so peak memory is bounded by the
+# kept triples rather than by the size of the file.
+CLASS_TYPES = (OWL.Class, RDFS.Class)
+PROPERTY_TYPES = (OWL.ObjectProperty, OWL.DatatypeProperty)
+KEPT_TYPES = CLASS_TYPES + PROPERTY_TYPES + (OWL.Restriction,)
+
+class MetricStore(Store):
+    def __init__(self):
+        super().__init__()
+        self.ids = {}
+        self.types = {rdf_type: set() for rdf_type in KEPT_TYPES}
+        self.subclass_edges = set()
+        self.on_property = set()
+        self.imports = set()
+        self.triples_seen = 0
+
+    def intern(self, term):
+        term_id = self.ids.get(term)
+        if term_id is None:
+            term_id = self.ids[term] = len(self.ids)
+        return term_id
+
+    def add(self, triple, context=None, quoted=False):
+        self.triples_seen += 1
+        s, p, o = triple
+        if p == RDF.type:
+            if o in self.types:
+                self.types[o].add(self.intern(s))
+        elif p == RDFS.subClassOf:
+            self.subclass_edges.add((self.intern(s), self.intern(o)))
+        elif p == OWL.onProperty:
+            self.on_property.add((self.intern(s), self.intern(o)))
+        elif p == OWL.imports:
+            self.imports.add(str(o))
+
+    def addN(self, quads):
+        for s, p, o, context in quads:
+            self.add((s, p, o), context)
+
+    def __len__(self, context=None):
+        return len(self.subclass_edges) + len(self.on_property) + len(self.imports) + sum(len(ids) for ids in self.types.values())
+
+    def triples(self, triple_pattern, context=None):
+        # Nothing is kept in rdflib form; the parsers never read back
+        return iter(())
+
+    def bind(self, prefix, namespace, override=True):
+        pass
+
+    def namespaces(self):
+        return iter(())
+
+def stream_ontology(source, format='nt'):
+    store = MetricStore()
+    start_time = time.perf_counter()
+    Graph(store=store).parse(source, format=format)
+    return store, time.perf_counter() - start_time
+
+def evaluate_stream(source, format='nt'):
+    # Same result dictionary as structural.evaluate_ontology; reasoning and the SPARQL
+    # benchmark need a full graph and are reported as not run
+    store, load_time = stream_ontology(source, format)
+    classes = store.types[OWL.Class] | store.types[RDFS.Class]
+    hierarchy = structural.hierarchy_from_edges(classes, store.subclass_edges)
+    return structural.structural_results(hierarchy, len(store.types[OWL.ObjectProperty]), len(store.types[OWL.DatatypeProperty]), load_time)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python streaming.py <ontology_file> [format]")
+        sys.exit(1)
+
+    tracemalloc.start()
+    result = evaluate_stream(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else 'nt')
+    peak = tracemalloc.get_traced_memory()[1]
+    for key, value in result.items():
+        print(f"{key}: {value}")
+    print(f"Peak memory: {peak / (1024 * 1024):.2f} MB")
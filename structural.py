@@ -1,300 +1,347 @@
 import sys
-import rdflib
-from rdflib import Graph, RDF, OWL, RDFS
-import requests
-import tempfile
-from owlready2 import get_ontology, sync_reasoner_pellet, OwlReadyInconsistentOntologyError
-import time
+from rdflib import RDF, OWL, RDFS
+import budgets
+import ontology_loader
+import reasoning
+import snapshot
+import sparql_benchmark
+import instrumentation
 
-def count_elements(graph):
-    classes = set(graph.subjects(RDF.type, OWL.Class))
-    object_properties = set(graph.subjects(RDF.type, OWL.ObjectProperty))
-    
-    for s, p, o in graph.triples((None, RDF.type, OWL.Restriction)):
-        for sub, prop, obj in graph.triples((s, OWL.onProperty, None)):
-            if (obj, RDF.type, OWL.ObjectProperty) in graph:
-                object_properties.add(obj)
-            elif (obj, RDF.type, OWL.Class) in graph:
-                classes.add(obj)
-
-    return len(object_properties), len(classes)
-
-def download_and_parse_ontology(url):
-    try:
-        response = requests.get(url, headers={"Accept": "text/turtle,application/rdf+xml"}, allow_redirects=True)
-        response.raise_for_status()
-        graph = Graph()
-        parse_start_time = time.perf_counter()
-        graph.parse(data=response.content, format='turtle')
-        parse_time = time.perf_counter() - parse_start_time
-        print(f"Ontology parsed from {url} in {parse_time:.8f} seconds.")  # Debug: Confirm parse time
-        print(f"Number of triples in ontology: {len(list(graph))}")  # Debug: Print number of triples
-        return graph
-    except requests.exceptions.RequestException as e:
-        print(f"Failed to download ontology from {url}: {e}")
-        return None
-    except Exception as e:
-        print(f"Failed to parse ontology from {url}: {e}")
-        return None
-
-def resolve_imports(graph, base_url, temp_dir):
-    for _, _, imported_iri in graph.triples((None, OWL.imports, None)):
-        imported_iri = str(imported_iri)
-        if not imported_iri.startswith('http://') and not imported_iri.startswith('https://'):
-            imported_iri = base_url + imported_iri if base_url else imported_iri
-        print(f"Resolved IRI: {imported_iri}")
-        imported_graph = download_and_parse_ontology(imported_iri)
-        if imported_graph:
-            graph += imported_graph
-            resolve_imports(imported_graph, base_url, temp_dir)
-        else:
-            print(f"Failed to download or load ontology from URL: {imported_iri}")
-
-def load_ontology(source):
-    if not source:
-        print("No source provided for ontology.")
-        return None, 0
-    print(f"Loading ontology from source: {source}")
-    if source.startswith('http://') or source.startswith('https://'):
-        start_time = time.perf_counter()  # Higher precision timer
-        main_graph = download_and_parse_ontology(source)
-        load_time = time.perf_counter() - start_time
-        base_url = source.rsplit('/', 1)[0] + '/' if main_graph else None
-    else:
-        base_url = None
-        try:
-            start_time = time.perf_counter()  # Higher precision timer
-            main_graph = Graph()
-            parse_start_time = time.perf_counter()
-            main_graph.parse(source, format='turtle')
-            parse_time = time.perf_counter() - parse_start_time
-            load_time = time.perf_counter() - start_time
-            print(f"Ontology parsed from file in {parse_time:.8f} seconds.")  # Debug: Print parse time
-            print(f"Total loading time: {load_time:.8f} seconds")  # Debug: Print load time
-        except FileNotFoundError:
-            print("The file path is not correct. Please provide a valid file path.")
-            main_graph = None
-            load_time = 0
-
-    if main_graph:
-        print(f"Ontology has {len(list(main_graph))} triples.")  # Debug: Print number of triples
-        with tempfile.TemporaryDirectory() as temp_dir:
-            if base_url:
-                resolve_imports(main_graph, base_url, temp_dir)
-            object_properties_count, classes_count = count_elements(main_graph)
-            print(f"Total - Object Properties: {object_properties_count}, Classes: {classes_count}")
-            return main_graph, load_time
-    else:
-        print("Failed to load the ontology.")
-        return None, 0
+log = instrumentation.get_logger("structural")
 
+# The class and property getters and build_class_hierarchy take an rdflib graph or a
+# snapshot.GraphSnapshot of one. On a snapshot they return sorted id arrays, and the
+# hierarchy is keyed by term ids; the metrics are the same either way.
 def get_classes(graph):
+    if isinstance(graph, snapshot.GraphSnapshot):
+        return graph.typed(OWL.Class, RDFS.Class)
     classes = set(graph.subjects(RDF.type, OWL.Class)).union(set(graph.subjects(RDF.type, RDFS.Class)))
     return classes
 
 def get_properties(graph):
+    if isinstance(graph, snapshot.GraphSnapshot):
+        return graph.typed(OWL.ObjectProperty, OWL.DatatypeProperty)
     properties = set(graph.subjects(RDF.type, OWL.ObjectProperty)).union(set(graph.subjects(RDF.type, OWL.DatatypeProperty)))
     return properties
 
+def get_object_properties(graph):
+    if isinstance(graph, snapshot.GraphSnapshot):
+        return graph.typed(OWL.ObjectProperty)
+    return set(graph.subjects(RDF.type, OWL.ObjectProperty))
+
 def get_datatype_properties(graph):
+    if isinstance(graph, snapshot.GraphSnapshot):
+        return graph.typed(OWL.DatatypeProperty)
     datatype_properties = set(graph.subjects(RDF.type, OWL.DatatypeProperty))
     return datatype_properties
 
-def concept_structure(graph):
+def build_class_hierarchy(graph):
+    # Single scan of the rdfs:subClassOf triples; every hierarchy metric reads from this index
+    if isinstance(graph, snapshot.GraphSnapshot):
+        return hierarchy_from_snapshot(graph)
+    return hierarchy_from_edges(get_classes(graph), graph.subject_objects(RDFS.subClassOf))
+
+@instrumentation.timed("metric.class_hierarchy")
+def hierarchy_from_edges(classes, subclass_edges):
+    # classes and the (subclass, superclass) pairs may be rdflib terms or interned ids
+    parents = {}
+    children = {}
+    subclass_triples = 0
+    for sub, sup in subclass_edges:
+        parents.setdefault(sub, set()).add(sup)
+        children.setdefault(sup, set()).add(sub)
+        subclass_triples += 1
+    roots = set(cls for cls in classes if cls not in parents)
+    leaves = set(cls for cls in classes if cls not in children)
+    return index_hierarchy(classes, parents, children, roots, leaves, subclass_triples)
+
+@instrumentation.timed("metric.class_hierarchy")
+def hierarchy_from_snapshot(graph):
+    # Roots and leaves are array set differences; only the traversal runs per class
+    np = graph.np
     classes = get_classes(graph)
+    subclasses, superclasses = graph.subject_objects(RDFS.subClassOf)
+    roots = set(np.setdiff1d(classes, subclasses).tolist())
+    leaves = set(np.setdiff1d(classes, superclasses).tolist())
+    return index_hierarchy(classes.tolist(), graph.group(subclasses, superclasses), graph.group(superclasses, subclasses),
+                           roots, leaves, len(subclasses))
+
+def index_hierarchy(classes, parents, children, roots, leaves, subclass_triples):
+    hierarchy = {
+        "classes": classes,
+        "parents": parents,
+        "children": children,
+        "roots": roots,
+        "leaves": leaves,
+        "subclass_triples": subclass_triples,
+    }
+    walk_hierarchy(hierarchy)
+    instrumentation.count("subclass_triples", subclass_triples)
+    if hierarchy["cycles"]:
+        log.warning("%d rdfs:subClassOf cycle(s) detected.", len(hierarchy["cycles"]))
+        log.debug("rdfs:subClassOf cycles: %s", hierarchy["cycles"])
+    return hierarchy
+
+def walk_hierarchy(hierarchy, nodes=None):
+    # Iterative post-order DFS over the child adjacency. For every node it records
+    # the height (a leaf has depth 1), the number of paths down to a leaf and the
+    # summed length of those paths, so ADIT-LN never has to enumerate the paths.
+    # Edges back onto the current DFS stack close a cycle; they are recorded and skipped.
+    # With nodes, the values already in hierarchy are kept and only nodes and their
+    # descendants without a value are walked. Returns the nodes given a value.
+    children = hierarchy["children"]
+    if nodes is None:
+        depth_map = {}
+        path_counts = {}
+        depth_sums = {}
+        cycles = []
+        nodes = hierarchy["classes"]
+    else:
+        depth_map = hierarchy["depth"]
+        path_counts = hierarchy["path_counts"]
+        depth_sums = hierarchy["depth_sums"]
+        cycles = hierarchy["cycles"]
+    visited = []
+    on_stack = set()
+    for cls in nodes:
+        if cls in depth_map:
+            continue
+        stack = [(cls, iter(children.get(cls, ())))]
+        on_stack.add(cls)
+        while stack:
+            node, pending = stack[-1]
+            for sub in pending:
+                if sub in on_stack:
+                    cycles.append((node, sub))
+                elif sub not in depth_map:
+                    stack.append((sub, iter(children.get(sub, ()))))
+                    on_stack.add(sub)
+                    break
+            else:
+                stack.pop()
+                on_stack.discard(node)
+                subs = [sub for sub in children.get(node, ()) if sub in depth_map]
+                if subs:
+                    depth_map[node] = max(depth_map[sub] for sub in subs) + 1
+                    path_counts[node] = sum(path_counts[sub] for sub in subs)
+                    depth_sums[node] = sum(depth_sums[sub] + path_counts[sub] for sub in subs)
+                else:
+                    depth_map[node] = 1
+                    path_counts[node] = 1
+                    depth_sums[node] = 0
+                visited.append(node)
+    hierarchy["depth"] = depth_map
+    hierarchy["path_counts"] = path_counts
+    hierarchy["depth_sums"] = depth_sums
+    hierarchy["cycles"] = cycles
+    return visited
+
+@instrumentation.timed("metric.concept_structure")
+def concept_structure(graph, hierarchy=None):
+    if hierarchy is None:
+        hierarchy = build_class_hierarchy(graph)
+    parents = hierarchy["parents"]
     components_per_class = {}
-    for cls in classes:
-        components = set(graph.objects(subject=cls, predicate=RDFS.subClassOf))
-        components_per_class[cls] = components
+    for cls in hierarchy["classes"]:
+        components_per_class[cls] = set(parents.get(cls, ()))
     return components_per_class
 
-def relationship_richness(graph):
-    object_properties = set(graph.subjects(RDF.type, OWL.ObjectProperty))
-    datatype_properties = set(graph.subjects(RDF.type, OWL.DatatypeProperty))
-    num_relationships = len(object_properties) + len(datatype_properties)
-    num_subclass_relationships = len(list(graph.triples((None, RDFS.subClassOf, None))))
+@instrumentation.timed("metric.relationship_richness")
+def relationship_richness(graph, hierarchy=None):
+    if hierarchy is None:
+        hierarchy = build_class_hierarchy(graph)
+    object_properties = get_object_properties(graph)
+    datatype_properties = get_datatype_properties(graph)
+    return relationship_richness_from_counts(len(object_properties) + len(datatype_properties), hierarchy["subclass_triples"])
+
+def relationship_richness_from_counts(num_relationships, num_subclass_relationships):
     total_relationships = num_relationships + num_subclass_relationships
     if total_relationships == 0:
         return 0
     relationship_richness = (num_relationships / total_relationships) * 100
     return relationship_richness
 
-def inheritance_richness(graph):
-    classes = get_classes(graph)
-    subclass_counts = [len(set(graph.subjects(RDFS.subClassOf, cls))) for cls in classes]
+@instrumentation.timed("metric.inheritance_richness")
+def inheritance_richness(graph, hierarchy=None):
+    if hierarchy is None:
+        hierarchy = build_class_hierarchy(graph)
+    classes = hierarchy["classes"]
+    children = hierarchy["children"]
+    subclass_counts = [len(children.get(cls, ())) for cls in classes]
     if len(classes) == 0:
         return 0
     inheritance_richness_value = (sum(subclass_counts) / len(classes)) * 100
     return inheritance_richness_value
 
-def inheritance_depth(graph):
-    def get_depth(cls, depth_map):
-        if cls in depth_map:
-            return depth_map[cls]
-        subclasses = set(graph.subjects(RDFS.subClassOf, cls))
-        if not subclasses:
-            depth_map[cls] = 1
-            return 1
-        max_depth = 0
-        for sub in subclasses:
-            sub_depth = get_depth(sub, depth_map)
-            if sub_depth > max_depth:
-                max_depth = sub_depth
-        depth_map[cls] = max_depth + 1
-        return max_depth + 1
-    
-    classes = get_classes(graph)
-    depth_map = {}
-    
-    for cls in classes:
-        get_depth(cls, depth_map)
-    
+@instrumentation.timed("metric.inheritance_depth")
+def inheritance_depth(graph, hierarchy=None):
+    if hierarchy is None:
+        hierarchy = build_class_hierarchy(graph)
+    depth_map = hierarchy["depth"]
     # Return the maximum depth found
     return max(depth_map.values()) if depth_map else 0
 
-def count_subclasses(graph):
-    classes = get_classes(graph)
+@instrumentation.timed("metric.count_subclasses")
+def count_subclasses(graph, hierarchy=None):
+    if hierarchy is None:
+        hierarchy = build_class_hierarchy(graph)
+    classes = hierarchy["classes"]
+    children = hierarchy["children"]
     subclass_count = {}
     total_subclasses = 0
     for cls in classes:
-        subclasses = set(graph.subjects(RDFS.subClassOf, cls))
-        subclass_count[cls] = len(subclasses)
-        total_subclasses += len(subclasses)
+        subclass_count[cls] = len(children.get(cls, ()))
+        total_subclasses += subclass_count[cls]
     avg_subclasses_per_class = total_subclasses / len(classes) if len(classes) > 0 else 0
     return subclass_count, total_subclasses, avg_subclasses_per_class
 
-def count_roots_leaves(graph):
-    classes = get_classes(graph)
-    roots = set(cls for cls in classes if not list(graph.objects(subject=cls, predicate=RDFS.subClassOf)))
-    leaves = set(cls for cls in classes if not list(graph.subjects(RDFS.subClassOf, cls)))
-    return len(roots), len(leaves)
-
-def average_depth_of_inheritance_tree(graph):
-    def get_all_paths_to_leaves(cls, current_path):
-        subclasses = list(graph.subjects(RDFS.subClassOf, cls))
-        if not subclasses:
-            print(f"Leaf Node Path: {current_path}")  # Debug: Print the leaf node paths
-            return [current_path]  # Return the path if it's a leaf
-        paths = []
-        for sub in subclasses:
-            paths.extend(get_all_paths_to_leaves(sub, current_path + [sub]))
-        return paths
+@instrumentation.timed("metric.count_roots_leaves")
+def count_roots_leaves(graph, hierarchy=None):
+    if hierarchy is None:
+        hierarchy = build_class_hierarchy(graph)
+    return len(hierarchy["roots"]), len(hierarchy["leaves"])
 
-    classes = get_classes(graph)
-    root_classes = [cls for cls in classes if not list(graph.objects(cls, RDFS.subClassOf))]
-    print(f"Root Classes: {root_classes}")  # Debug: Print the root classes
-    all_paths = []
+@instrumentation.timed("metric.average_depth_of_inheritance_tree")
+def average_depth_of_inheritance_tree(graph, hierarchy=None):
+    if hierarchy is None:
+        hierarchy = build_class_hierarchy(graph)
+    root_classes = list(hierarchy["roots"])
+    log.debug("%d root classes.", len(root_classes))
 
-    for root in root_classes:
-        all_paths.extend(get_all_paths_to_leaves(root, [root]))
-
-    if not all_paths:
-        return 0.0
-
-    total_depth = sum(len(path) - 1 for path in all_paths)
-    num_paths = len(all_paths)
+    # Each root-to-leaf path is counted, not built: a root with n paths whose lengths sum to d adds n and d
+    num_paths = sum(hierarchy["path_counts"][root] for root in root_classes)
+    total_depth = sum(hierarchy["depth_sums"][root] for root in root_classes)
 
+    instrumentation.count("paths", num_paths)
     if num_paths == 0:
         return 0.0
 
     average_depth = total_depth / num_paths
-    print(f"Total Depth: {total_depth}, Number of Paths: {num_paths}, Average Depth: {average_depth}")  # Debug: Print depth details
+    log.debug("Total Depth: %d, Number of Paths: %d, Average Depth: %f", total_depth, num_paths, average_depth)
     return average_depth
 
-def check_consistency(graph):
+def check_consistency(graph, reasoner_input=None, budget=None):
+    # (None, None) when budget stops the reasoner, which is recorded as truncated
     try:
-        temp_owl_path = tempfile.NamedTemporaryFile(suffix=".owl", delete=False).name
-        graph.serialize(destination=temp_owl_path, format='xml')
-        print(f"Ontology serialized to {temp_owl_path}")  # Debug: Confirm serialization
-        ontology = get_ontology(f"file://{temp_owl_path}").load()
-        print("Ontology loaded for reasoning.")  # Debug: Print to confirm reasoning starts
-        try:
-            start_time = time.time()
-            sync_reasoner_pellet(infer_property_values=True)
-            reasoning_time = time.time() - start_time
-            print(f"Reasoning completed in {reasoning_time:.4f} seconds.")  # Debug: Print reasoning time
-            return 1, reasoning_time  # Consistent
-        except OwlReadyInconsistentOntologyError:
-            print("Ontology is inconsistent.")  # Debug: Print inconsistency
-            return 0, 0  # Inconsistent
+        with instrumentation.span("reasoning"):
+            consistency_result, reasoning_time = reasoning.check_consistency(graph, reasoner_input,
+                                                                             budget.reasoner_time() if budget else None,
+                                                                             budget.cancelled if budget else None)
+        if not consistency_result:
+            log.info("Ontology is inconsistent.")
+        return consistency_result, reasoning_time
+    except budgets.BudgetExceeded as e:
+        budget.truncate("reasoning", str(e))
+        return None, None
     except Exception as e:
         print(f"Error during consistency check: {e}")
         return 0, 0
 
-def execute_queries(graph):
-    queries = [
-        """
-        SELECT ?class WHERE {
-            ?class a owl:Class .
-        }
-        """,
-        """
-        SELECT ?property WHERE {
-            ?property a owl:ObjectProperty .
-        }
-        """,
-        """
-        SELECT ?subject ?predicate ?object WHERE {
-            ?subject ?predicate ?object .
-        } LIMIT 100
-        """
-    ]
-    query_times = []
-    for query in queries:
-        start_time = time.time()
-        list(graph.query(query))
-        query_times.append(time.time() - start_time)
-    return query_times
+def execute_queries(graph, queries=None, stop=None):
+    # Per-query timing statistics (min, median, p95) of the benchmark workload
+    return sparql_benchmark.run_workload(graph, queries, stop=stop)
 
-def evaluate_ontology(graph, load_time):
-    concept_structure_result = concept_structure(graph)
-    relationship_richness_result = relationship_richness(graph)
-    inheritance_richness_result = inheritance_richness(graph)
-    inheritance_depth_result = inheritance_depth(graph)
-    subclass_count_result, total_subclasses, avg_subclasses_per_class = count_subclasses(graph)
-    num_roots, num_leaves = count_roots_leaves(graph)
-    avg_depth_leaves = average_depth_of_inheritance_tree(graph)*100  # Updated calculation with debugging
-    if avg_depth_leaves == 0:
-        avg_depth_leaves = avg_subclasses_per_class*100
-    consistency_result, reasoning_time = check_consistency(graph)
-    query_times = execute_queries(graph)
+@instrumentation.timed("structural")
+def evaluate_ontology(graph, load_time, snapshot=None, reasoner_input=None, budget=None):
+    # snapshot: optional snapshot.GraphSnapshot of graph, which the class, property and
+    # hierarchy metrics read instead (reasoning and queries always run on graph).
+    # reasoner_input: optional callable returning the graph serialized for owlready2.
+    # budget: optional budgets.Budget bounding the reasoner and the stage; what it cuts
+    # short is listed under "Truncated" and the other metrics are reported as usual.
+    budget = budget or budgets.Budget()
+    metrics_graph = snapshot if snapshot is not None else graph
+    hierarchy = build_class_hierarchy(metrics_graph)
+    consistency_result, reasoning_time = check_consistency(graph, reasoner_input, budget)
+    queries = sparql_benchmark.workload()
+    query_times = execute_queries(graph, queries, budget.expired)
+    if len(query_times) < len(queries):
+        budget.truncate("queries", f"{len(query_times)} of {len(queries)} queries run before the stage ended")
     
-    object_properties = set(graph.subjects(RDF.type, OWL.ObjectProperty))
-    datatype_properties = get_datatype_properties(graph)
-    total_properties = len(object_properties) + len(datatype_properties)
+    object_properties = get_object_properties(metrics_graph)
+    datatype_properties = get_datatype_properties(metrics_graph)
+    structural_result = structural_results(hierarchy, len(object_properties), len(datatype_properties), load_time, reasoning_time, query_times)
+    truncated = budgets.describe(budget.truncated, ("reasoning", "queries"))
+    if truncated:
+        structural_result["Truncated"] = truncated
+    return structural_result
+
+def evaluate_loaded(loaded, include_imports=True, budget=None):
+    # evaluate_ontology for an ontology_loader.LoadedOntology, on the union with its
+    # imports or on the main ontology alone. Imports left out by the load budget are
+    # listed under "Truncated" as well.
+    structural_result = evaluate_ontology(loaded.view(include_imports), loaded.load_time, loaded.snapshot(include_imports),
+                                          lambda: loaded.reasoner_input(include_imports), budget)
+    truncated = budgets.describe(loaded.truncated, ("triples", "imports") if include_imports else ("triples",))
+    if truncated:
+        structural_result["Truncated"] = "; ".join(filter(None, (truncated, structural_result.get("Truncated"))))
+    return structural_result
+
+def structural_results(hierarchy, num_object_properties, num_datatype_properties, load_time, reasoning_time=None, query_times=None):
+    # Metrics that only need the hierarchy index and property counts. Reasoning and query
+    # times are reported as not run when None (e.g. for streamed ontologies).
+    relationship_richness_result = relationship_richness_from_counts(num_object_properties + num_datatype_properties, hierarchy["subclass_triples"])
+    inheritance_richness_result = inheritance_richness(None, hierarchy)
+    inheritance_depth_result = inheritance_depth(None, hierarchy)
+    subclass_count_result, total_subclasses, avg_subclasses_per_class = count_subclasses(None, hierarchy)
+    num_roots, num_leaves = count_roots_leaves(None, hierarchy)
+    average_depth = average_depth_of_inheritance_tree(None, hierarchy)
+    return format_structural_results({
+        "relationship_richness": relationship_richness_result,
+        "inheritance_richness": inheritance_richness_result,
+        "inheritance_depth": inheritance_depth_result,
+        "total_subclasses": total_subclasses,
+        "avg_subclasses_per_class": avg_subclasses_per_class,
+        "num_object_properties": num_object_properties,
+        "num_datatype_properties": num_datatype_properties,
+        "num_roots": num_roots,
+        "num_leaves": num_leaves,
+        "average_depth": average_depth,
+        "num_cycles": len(hierarchy["cycles"]),
+    }, load_time, reasoning_time, query_times)
+
+def format_structural_results(metrics, load_time, reasoning_time=None, query_times=None):
+    # The result dictionary shown by the app, from the raw metric values
+    avg_depth_leaves = metrics["average_depth"]*100  # Updated calculation with debugging
+    if avg_depth_leaves == 0:
+        avg_depth_leaves = metrics["avg_subclasses_per_class"]*100
+    total_properties = metrics["num_object_properties"] + metrics["num_datatype_properties"]
     
     # Prepare a dictionary to store all results
     structural_result = {
-        "Relationship Richness": f"{relationship_richness_result:.2f}%",
-        "Inheritance Richness": f"{inheritance_richness_result:.2f}%",
-        "Sum of the number of subclasses": total_subclasses,
-        "Average number of subclasses per class": avg_subclasses_per_class,
-        "Inheritance Depth": inheritance_depth_result,
-        "Number of object properties": len(object_properties),
-        "Number of datatype properties": len(datatype_properties),
+        "Relationship Richness": f"{metrics['relationship_richness']:.2f}%",
+        "Inheritance Richness": f"{metrics['inheritance_richness']:.2f}%",
+        "Sum of the number of subclasses": metrics["total_subclasses"],
+        "Average number of subclasses per class": metrics["avg_subclasses_per_class"],
+        "Inheritance Depth": metrics["inheritance_depth"],
+        "Number of object properties": metrics["num_object_properties"],
+        "Number of datatype properties": metrics["num_datatype_properties"],
         "Total number of relationships (properties)": total_properties,
-        "Number of Roots (NoR)": num_roots,
-        "Number of Leaves (NoL)": num_leaves,
+        "Number of Roots (NoR)": metrics["num_roots"],
+        "Number of Leaves (NoL)": metrics["num_leaves"],
         "Average Depth of Inheritance Tree of Leaf Nodes (ADIT-LN)": f"{avg_depth_leaves:.2f}",
+        "Number of subClassOf cycles": metrics["num_cycles"],
         "Time to parse ontology": f"{load_time:.8f} seconds",  # Higher precision
-        "Time to perform reasoning": f"{reasoning_time:.4f} seconds",
-        "Time to execute query 1": f"{query_times[0]:.4f} seconds",
-        "Time to execute query 2": f"{query_times[1]:.4f} seconds",
-        "Time to execute query 3": f"{query_times[2]:.4f} seconds",
+        "Time to perform reasoning": f"{reasoning_time:.4f} seconds" if reasoning_time is not None else "not run",
     }
+    if query_times:
+        for stats in query_times:
+            structural_result[f"Time to execute query {stats['name']}"] = f"{stats['median']:.4f} seconds (min {stats['min']:.4f}, p95 {stats['p95']:.4f}, {stats['iterations']} runs)"
+    else:
+        for number in range(3):
+            structural_result[f"Time to execute query {number + 1}"] = "not run"
     
     return structural_result
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python structural.py <ontology_source>")
+        print("Usage: python structural.py <ontology_source> [--no-imports]")
         sys.exit(1)
 
     ontology_source = sys.argv[1]
-    graph, load_time = load_ontology(ontology_source)
+    loaded = ontology_loader.load(ontology_source)
 
-    if graph:
-        structural_result = evaluate_ontology(graph, load_time)
+    if loaded:
+        structural_result = evaluate_loaded(loaded, include_imports="--no-imports" not in sys.argv[2:])
         for key, value in structural_result.items():
             print(f"{key}: {value}")
     else:
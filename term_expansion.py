@@ -0,0 +1,178 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import graph_cache
+
+# Related-term sources for the lexical metrics, both cached on disk: Datamuse responses
+# expire after DATAMUSE_TTL seconds, WordNet expansions never change and are kept until
+# evicted. With ONTOREUSE_OFFLINE=1 no network request is made and only cached
+# Datamuse entries (however old) and the local WordNet corpus are used.
+DATAMUSE_URL = "https://api.datamuse.com/words"
+DATAMUSE_TAGS = ['ml', 'rel_syn', 'rel_jja', 'rel_trg']
+DATAMUSE_TTL = float(os.environ.get("ONTOREUSE_DATAMUSE_TTL", 30 * 24 * 3600))
+TERM_CACHE_DIR = os.path.join(graph_cache.CACHE_DIR, "terms")
+TERM_CACHE_MAX_ENTRIES = int(os.environ.get("ONTOREUSE_TERM_CACHE_MAX_ENTRIES", 20000))
+OFFLINE = os.environ.get("ONTOREUSE_OFFLINE", "0") == "1"
+
+_datamuse_memo = {}
+_wordnet_memo = {}
+_wordnet_lock = threading.Lock()
+_wordnet_compute_lock = threading.Lock()
+_wordnet_ready = None
+
+def entry_path(namespace, key):
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return os.path.join(TERM_CACHE_DIR, namespace, digest + ".json")
+
+def read_entry(namespace, key):
+    path = entry_path(namespace, key)
+    try:
+        with open(path, 'r') as file:
+            entry = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return None
+    return entry if entry.get("key") == key else None
+
+def write_entry(namespace, key, words):
+    path = entry_path(namespace, key)
+    entry = {"key": key, "fetched": time.time(), "words": sorted(words)}
+    try:
+        graph_cache.atomic_write(path, json.dumps(entry).encode("utf-8"))
+        evict(os.path.dirname(path))
+    except OSError as e:
+        print(f"Failed to write term cache entry for {key}: {e}")
+
+def evict(directory, max_entries=None):
+    # Keep the newest max_entries entries of one namespace
+    max_entries = TERM_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+    entries = [(entry.stat().st_mtime, entry.path) for entry in os.scandir(directory) if entry.name.endswith(".json")]
+    if len(entries) <= max_entries:
+        return
+    entries.sort()
+    for _, path in entries[:len(entries) - max_entries]:
+        os.remove(path)
+
+def cached_datamuse(tag, term):
+    # Returns the cached words for one query, or None when it has to be fetched
+    key = f"{tag}={term}"
+    entry = _datamuse_memo.get(key)
+    if entry is None:
+        entry = read_entry("datamuse", key)
+        if entry is None:
+            return None
+        _datamuse_memo[key] = entry
+    if OFFLINE or time.time() - entry["fetched"] < DATAMUSE_TTL:
+        return set(entry["words"])
+    return None
+
+def fetch_datamuse(tag, term):
+    key = f"{tag}={term}"
+    try:
+        response = graph_cache.http_session().get(DATAMUSE_URL, params={tag: term}, timeout=10)
+        response.raise_for_status()
+        words = set(item['word'] for item in response.json() if 'word' in item)
+    except requests.exceptions.RequestException as e:
+        print(f"Failed to fetch related words from Datamuse API: {e}")
+        # A stale answer is better than none
+        entry = _datamuse_memo.get(key) or read_entry("datamuse", key)
+        return set(entry["words"]) if entry else set()
+    write_entry("datamuse", key, words)
+    _datamuse_memo[key] = {"key": key, "fetched": time.time(), "words": sorted(words)}
+    return words
+
+def datamuse_words(term, tags=None):
+    # Cached tags are answered locally; the others are requested concurrently
+    tags = tags or DATAMUSE_TAGS
+    words = set()
+    missing = []
+    for tag in tags:
+        cached = cached_datamuse(tag, term)
+        if cached is None:
+            missing.append(tag)
+        else:
+            words.update(cached)
+    if missing and not OFFLINE:
+        with ThreadPoolExecutor(max_workers=len(missing)) as pool:
+            for tag_words in pool.map(lambda tag: fetch_datamuse(tag, term), missing):
+                words.update(tag_words)
+    return words
+
+def wordnet_available():
+    # Checks the local NLTK data only; provisioning happens in provision_wordnet()
+    global _wordnet_ready
+    if _wordnet_ready is None:
+        import nltk
+        try:
+            nltk.data.find('corpora/wordnet')
+            _wordnet_ready = True
+        except LookupError:
+            try:
+                nltk.data.find('corpora/wordnet.zip')
+                _wordnet_ready = True
+            except LookupError:
+                _wordnet_ready = False
+    return _wordnet_ready
+
+def provision_wordnet():
+    global _wordnet_ready
+    import nltk
+    _wordnet_ready = None
+    if not wordnet_available() and not OFFLINE:
+        nltk.download('wordnet')
+        _wordnet_ready = None
+    return wordnet_available()
+
+def compute_wordnet_terms(term, pos):
+    from nltk.corpus import wordnet as wn
+    synonyms = set()
+    for synset in wn.synsets(term, pos=pos):
+        for lemma in synset.lemmas():
+            synonyms.add(lemma.name().replace('_', ' '))
+        for hypernym in synset.hypernyms():
+            for lemma in hypernym.lemmas():
+                synonyms.add(lemma.name().replace('_', ' '))
+        for hyponym in synset.hyponyms():
+            for lemma in hyponym.lemmas():
+                synonyms.add(lemma.name().replace('_', ' '))
+    return synonyms
+
+def wordnet_terms(term, pos='n'):
+    # Synonyms, hypernyms and hyponyms of term, memoized in memory and on disk
+    key = f"{pos}:{term}"
+    with _wordnet_lock:
+        if key in _wordnet_memo:
+            return list(_wordnet_memo[key])
+    entry = read_entry("wordnet", key)
+    if entry:
+        words = set(entry["words"])
+    elif wordnet_available():
+        # The NLTK corpus reader loads lazily and is not safe to first use from several threads
+        with _wordnet_compute_lock:
+            words = compute_wordnet_terms(term, pos)
+        write_entry("wordnet", key, words)
+    else:
+        print("WordNet is not installed; run 'python term_expansion.py provision'.")
+        return []
+    with _wordnet_lock:
+        _wordnet_memo[key] = words
+    return list(words)
+
+def precompute(terms, pos='n'):
+    for term in terms:
+        wordnet_terms(term.strip().lower(), pos)
+        if not OFFLINE:
+            datamuse_words(term.strip().lower())
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("provision", "precompute"):
+        print("Usage: python term_expansion.py provision | precompute <term> [<term> ...]")
+        sys.exit(1)
+    if sys.argv[1] == "provision":
+        print("WordNet available." if provision_wordnet() else "WordNet could not be installed.")
+    else:
+        precompute(sys.argv[2:])
@@ -0,0 +1,23 @@
+import lexical
+
+# match_concepts (NumPy) must agree with concepts_matching (pure Python) term by term
+def python_matches(terms, concepts, threshold=0.8):
+    concept_index = lexical.build_concept_index(concepts)
+    matches = {term: sorted(lexical.concepts_matching(term, concept_index, threshold)) for term in terms}
+    return {term: found for term, found in matches.items() if found}
+
+def numpy_matches(terms, concepts, threshold=0.8):
+    return {term: sorted(found) for term, found in lexical.match_concepts(terms, concepts, threshold).items()}
+
+def test_empty_terms_match_like_concepts_matching():
+    for terms, concepts in [([""], ["", "Solar"]),
+                            ([""], ["Solar"]),
+                            (["", ""], ["", "a", "ab"]),
+                            (["", "solar"], ["", "Solar", "solar", "sola"])]:
+        assert numpy_matches(terms, concepts) == python_matches(terms, concepts)
+
+def test_terms_match_like_concepts_matching():
+    terms = ["solar panel", "photovoltaic", "energy", "grid", "Battery", "unrelated"]
+    concepts = ["SolarPanel", "solar panel", "Photovoltaics", "Energy", "EnergyGrid", "grid", "Batteries", ""]
+    for threshold in (0.5, 0.8, 0.95):
+        assert numpy_matches(terms, concepts, threshold) == python_matches(terms, concepts, threshold)
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import graph_cache
+import rdf_formats
+
+# Uploaded ontologies are read from the request stream exactly once. While the bytes
+# are copied into an anonymous spool file they are counted against MAX_UPLOAD_BYTES
+# and hashed into the graph cache key, and the first chunk decides the serialization.
+# The spool is then parsed through a memory map (graph_cache.parse_mapped).
+MAX_UPLOAD_BYTES = int(os.environ.get("ONTOREUSE_MAX_UPLOAD_BYTES", 200 * 1024 * 1024))
+CHUNK_SIZE = 1024 * 1024
+
+class UploadTooLarge(ValueError):
+    pass
+
+def spool_upload(stream, media_type=None, filename=None, public_id=None, max_bytes=None):
+    # Returns {"file", "format", "key", "size", "head", "filename", "public_id"}; the
+    # caller closes upload["file"] (an anonymous temporary file) when done.
+    max_bytes = MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    head = stream.read(rdf_formats.SNIFF_BYTES)
+    if not head:
+        raise ValueError("The uploaded file is empty.")
+    format = rdf_formats.detect_format(head, media_type, filename)
+    digest = graph_cache.content_hasher(format, public_id)
+    spool = tempfile.TemporaryFile()
+    size = 0
+    try:
+        chunk = head
+        while chunk:
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"The uploaded file is larger than {max_bytes} bytes.")
+            digest.update(chunk)
+            spool.write(chunk)
+            chunk = stream.read(CHUNK_SIZE)
+        spool.flush()
+    except BaseException:
+        spool.close()
+        raise
+    return {
+        "file": spool,
+        "format": format,
+        "key": digest.hexdigest(),
+        "size": size,
+        "head": head,
+        "filename": filename,
+        "public_id": public_id,
+    }
+
+def spool_file_storage(file_storage, public_id=None, max_bytes=None):
+    # Spools a Flask/werkzeug FileStorage from request.files
+    return spool_upload(file_storage.stream, file_storage.mimetype, file_storage.filename, public_id, max_bytes)
+
+def parse_upload(upload, graph=None):
+    return graph_cache.parse_mapped(upload["file"], upload["format"], upload["key"], upload["public_id"], graph)
+
+def close_upload(upload):
+    upload["file"].close()